@@ -147,9 +147,14 @@ const App: React.FC = () => {
         if (files && typeof files === 'object') {
           setGeneratedFiles(files);
 
-          if (files['chunks_with_id.json'] && Array.isArray(files['chunks_with_id.json'])) {
-            setChunks(files['chunks_with_id.json']);
-            addLog(`[OK] Loaded ${files['chunks_with_id.json'].length} chunks`, 'success');
+          if (!files['train.json'] && files['train.jsonl']) {
+            setSelectedExport('train.jsonl');
+          }
+
+          const records = files['chunks_with_id.json'] ?? files['chunks_with_id.jsonl'];
+          if (records && Array.isArray(records)) {
+            setChunks(records);
+            addLog(`[OK] Loaded ${records.length} chunks`, 'success');
           } else {
             addLog('[WARN] No chunks found in output', 'warning');
           }
@@ -190,8 +195,15 @@ const App: React.FC = () => {
     const data = generatedFiles[selectedExport];
     if (!data) return;
     
-    const content = typeof data === 'string' ? data : JSON.stringify(data, null, 2);
-    const mime = selectedExport.endsWith('.json') ? 'application/json' : 'text/plain';
+    const isJsonl = selectedExport.endsWith('.jsonl');
+    const content = typeof data === 'string'
+      ? data
+      : isJsonl
+        ? data.map((record: unknown) => JSON.stringify(record)).join('\n') + '\n'
+        : JSON.stringify(data, null, 2);
+    const mime = isJsonl
+      ? 'application/x-ndjson'
+      : selectedExport.endsWith('.json') ? 'application/json' : 'text/plain';
     const blob = new Blob([content], { type: mime });
     const a = document.createElement('a');
     a.href = URL.createObjectURL(blob);
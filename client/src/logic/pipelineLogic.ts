@@ -11,6 +11,22 @@ import { DatasetChunk, DatasetReport } from '../types';
 // API base (env-safe). If empty, use same origin.
 const API = (import.meta as any).env?.VITE_API_BASE || '';
 
+// Workspace id (jobs/<id>) of this client's last pipeline run, read from its
+// "[JOB]" log line. Dataset and report requests name it, so concurrent runs
+// of other users never leak into this client.
+let currentJob: string | null = null;
+
+const JOB_LINE = /^\[JOB\] (?:Job workspace: \S*\/)?([\w.-]+)$/;
+
+function trackJob(message: string) {
+  const match = JOB_LINE.exec(message);
+  if (match) currentJob = match[1];
+}
+
+function jobQuery(job: string): string {
+  return `?job=${encodeURIComponent(job)}`;
+}
+
 // ============================================================================
 // PYTHON BACKEND COMMUNICATION
 // ============================================================================
@@ -28,6 +44,7 @@ export async function executePythonPipeline(
   filePath: string,
   onLog: (message: string, type: 'info' | 'success' | 'error' | 'warning') => void
 ): Promise<boolean> {
+  currentJob = null;
   try {
     // Check if we're running in Tauri environment
     if (window.__TAURI__) {
@@ -60,6 +77,7 @@ async function executeTauriPipeline(
     for (const line of logs) {
       if (line.startsWith('LOG:')) {
         const message = line.substring(5).trim();
+        trackJob(message);
         const type = detectLogType(message);
         onLog(message, type);
       }
@@ -117,8 +135,21 @@ async function executeFetchPipeline(
 
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
+    let pending = '';
     onLog('[INFO] Backend connected, running pipeline...', 'info');
 
+    const emit = (line: string) => {
+      if (!line) return;
+      if (line.startsWith('LOG:')) {
+        const message = line.substring(5).trim();
+        trackJob(message);
+        const type = detectLogType(message);
+        onLog(message, type);
+      } else {
+        onLog(line, 'info');
+      }
+    };
+
     while (true) {
       let chunk;
       try {
@@ -129,21 +160,16 @@ async function executeFetchPipeline(
       }
 
       const { done, value } = chunk as any;
-      if (done) break;
+      if (done) {
+        emit(pending);
+        break;
+      }
 
       try {
-        const text = decoder.decode(value, { stream: true });
-        const lines = text.split('\n');
-        for (const line of lines) {
-          if (!line) continue;
-          if (line.startsWith('LOG:')) {
-            const message = line.substring(5).trim();
-            const type = detectLogType(message);
-            onLog(message, type);
-          } else {
-            onLog(line, 'info');
-          }
-        }
+        // Lines can span stream chunks; keep the unfinished tail for later
+        const lines = (pending + decoder.decode(value, { stream: true })).split('\n');
+        pending = lines.pop() ?? '';
+        lines.forEach(emit);
       } catch (err) {
         onLog(`[ERROR] Failed to decode stream chunk: ${String(err)}`, 'error');
       }
@@ -177,19 +203,22 @@ function detectLogType(message: string): 'info' | 'success' | 'error' | 'warning
 // ============================================================================
 
 /**
- * Load generated dataset files from the output directory
+ * Load generated dataset files of a job workspace (default: the last run)
  */
-export async function loadGeneratedDatasets(): Promise<Record<string, any>> {
+export async function loadGeneratedDatasets(job: string | null = currentJob): Promise<Record<string, any>> {
   let files: Record<string, any> = {};
   const baseDir = '../datasets'; // Adjust path as needed
   
+  // Outputs live in the run's workspace, jobs/<id>/
+  if (!job) return {};
+  
   try {
     // For Tauri: Use Tauri's fs API
     if (window.__TAURI__) {
       const { readTextFile, readDir } = window.__TAURI__.fs;
       const { resolveResource } = window.__TAURI__.path;
       
-      const datasetPath = await resolveResource('datasets');
+      const datasetPath = await resolveResource(`jobs/${job}/datasets`);
       const entries = await readDir(datasetPath);
       
       for (const entry of entries) {
@@ -198,6 +227,8 @@ export async function loadGeneratedDatasets(): Promise<Record<string, any>> {
           
           if (entry.name.endsWith('.json')) {
             files[entry.name] = JSON.parse(content);
+          } else if (entry.name.endsWith('.jsonl')) {
+            files[entry.name] = content.split('\n').filter(Boolean).map((line) => JSON.parse(line));
           } else {
             files[entry.name] = content;
           }
@@ -206,7 +237,7 @@ export async function loadGeneratedDatasets(): Promise<Record<string, any>> {
     } else {
       // For HTTP API: Fetch from backend (env-safe)
       try {
-        const response = await fetch(`${API}/api/datasets`);
+        const response = await fetch(`${API}/api/datasets${jobQuery(job)}`);
         if (!response.ok) {
           return {};
         }
@@ -234,20 +265,22 @@ export async function loadGeneratedDatasets(): Promise<Record<string, any>> {
 }
 
 /**
- * Load the evaluation report
+ * Load the evaluation report of a job workspace (default: the last run)
  */
-export async function loadEvaluationReport(): Promise<DatasetReport | null> {
+export async function loadEvaluationReport(job: string | null = currentJob): Promise<DatasetReport | null> {
+  if (!job) return null;
+  
   try {
     if (window.__TAURI__) {
       const { readTextFile } = window.__TAURI__.fs;
       const { resolveResource } = window.__TAURI__.path;
       
-      const reportPath = await resolveResource('outputs/dataset_report.json');
+      const reportPath = await resolveResource(`jobs/${job}/outputs/dataset_report.json`);
       const content = await readTextFile(reportPath);
       return JSON.parse(content);
     } else {
       try {
-        const response = await fetch(`${API}/api/report`);
+        const response = await fetch(`${API}/api/report${jobQuery(job)}`);
         if (!response.ok) return null;
         const text = await response.text().catch(() => '');
         if (!text) return null;
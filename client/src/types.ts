@@ -40,7 +40,8 @@ export interface DatasetReport {
     max: number;
     mean: number;
   };
-  short_chunks_under_80w: number;
+  min_chunk_words: number;
+  short_chunks: number;
   duplicate_chunks: number;
   vocab_size_estimate: number;
   pair_label_balance: {
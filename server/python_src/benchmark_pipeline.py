@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Dataset Pipeline Engine
+Times individual pipeline stages on your own input files.
+
+Usage:
+    python benchmark_pipeline.py extract <file.pdf> [--workers 1,2,4,8] [--repeat 3]
+    python benchmark_pipeline.py startup [file.txt] [--repeat 5]
+    python benchmark_pipeline.py dictionary [--repeat 5]
+    python benchmark_pipeline.py split [--tokens 200000] [--repeat 3]
+    python benchmark_pipeline.py regex [file.txt] [--mb 100]
+    python benchmark_pipeline.py clean [file.txt] [--mb 100] [--workers 1,4]
+    python benchmark_pipeline.py filter <clean_text.txt> [--mb 100]
+    python benchmark_pipeline.py sentences <clean_text.txt> [--mb 20]
+    python benchmark_pipeline.py tokens <clean_text.txt> --tokenizer <bpe_dir> [--budgets 256,512,1024]
+    python benchmark_pipeline.py chunk <clean_text.txt> [--chunk-words 120,180,256] [--overlap-words 30]
+    python benchmark_pipeline.py dedup <clean_text.txt> [--copies 1,2,4] [--threshold 0.85]
+    python benchmark_pipeline.py export <clean_text.txt> [--mb 50] [--repeat 3]
+"""
+
+import sys
+import os
+import time
+import shutil
+import argparse
+import random
+import re
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pipeline_engine as engine
+
+def _best_of(fn, repeat):
+    """Run fn `repeat` times and return (best seconds, last result)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def bench_extract(args):
+    """Serial vs process-pool digital extraction (Block 3)"""
+
+    print("="*60)
+    print("Block 3 — Digital PDF Extraction")
+    print("="*60)
+
+    pdf_path = Path(args.file)
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    # Force the parallel path even for small test files
+    engine.PARALLEL_MIN_PAGES = 0
+
+    baseline = None
+    for workers in worker_counts:
+        secs, pages = _best_of(
+            lambda: engine.extract_digital_pages(pdf_path, workers), args.repeat
+        )
+        if baseline is None:
+            baseline = secs
+            reference = pages
+        assert pages == reference, "page text differs from the first run"
+
+        print(f"  workers={workers:<3} {secs:8.3f}s  "
+              f"{len(pages)/secs:9.1f} pages/s  x{baseline/secs:.2f}")
+
+def bench_startup(args):
+    """Cold-start wall time of a text-only job, one fresh interpreter per run"""
+
+    print("="*60)
+    print("Cold Start — text-only pipeline job")
+    print("="*60)
+
+    src_dir = Path(__file__).parent
+    txt = Path(args.file) if args.file else src_dir.parent.parent / "test_sample.txt"
+
+    # Run a private copy so the benchmark never touches the real outputs
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp) / "python_src"
+        work.mkdir()
+        shutil.copy(src_dir / "pipeline_engine.py", work)
+        shutil.copytree(src_dir / "dictionaries", work / "dictionaries")
+
+        def timed(cmd):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, cwd=work, stdout=subprocess.DEVNULL, check=True)
+            return time.perf_counter() - t0
+
+        bare = [timed([sys.executable, "-c", "pass"]) for _ in range(args.repeat)]
+        imp = [timed([sys.executable, "-c", "import pipeline_engine"]) for _ in range(args.repeat)]
+        runs = []
+        for _ in range(args.repeat):
+            # Drop the shared cache and the job workspace, or every run
+            # after the first would skip its up-to-date stages
+            for name in ("cache", "jobs"):
+                shutil.rmtree(Path(tmp) / name, ignore_errors=True)
+            runs.append(timed([sys.executable, "pipeline_engine.py", str(txt)]))
+
+    for label, times in (("interpreter", bare), ("import engine", imp), ("full text job", runs)):
+        print(f"  {label:<14} median {statistics.median(times):7.3f}s  "
+              f"best {min(times):7.3f}s")
+
+def bench_dictionary(args):
+    """Text dictionary parse vs compiled binary load (Block 4)"""
+
+    print("="*60)
+    print("Block 4 — Dictionary Load")
+    print("="*60)
+
+    def parse_text():
+        word_set = set()
+        with open(engine.DICT_PATH, encoding="utf-8-sig") as f:
+            for line in f:
+                w = line.strip().split()[0].lower() if line.strip() else ""
+                if w:
+                    word_set.add(w)
+        return word_set
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_path = Path(tmp) / "dictionary.bin"
+        build_secs, _ = _best_of(lambda: engine.build_dictionary(engine.DICT_PATH, bin_path), 1)
+        text_secs, word_set = _best_of(parse_text, args.repeat)
+        bin_secs, dictionary = _best_of(lambda: engine.FrequencyDictionary.load(bin_path), args.repeat)
+
+        assert set(dictionary.freqs) == word_set, "compiled dictionary differs from text"
+
+        print(f"  build (one-off)  {build_secs*1000:8.1f} ms  "
+              f"{bin_path.stat().st_size/1e6:.2f} MB")
+    print(f"  text parse       {text_secs*1000:8.1f} ms  {len(word_set):,} words")
+    print(f"  binary load      {bin_secs*1000:8.1f} ms  x{text_secs/bin_secs:.2f}")
+
+def bench_split(args):
+    """First-cut split loop vs frequency-weighted segmentation on synthetic broken tokens (Block 4)"""
+
+    print("="*60)
+    print("Block 4 — Dictionary Split Pass")
+    print("="*60)
+
+    dictionary = engine.load_dictionary()
+    word_set = dictionary.freqs
+
+    # OCR-like mix: run-together word pairs, long run-togethers and junk;
+    # run-togethers remember their true words, junk should stay unsplit
+    rng = random.Random(42)
+    words = [w for w in word_set if w.isalpha()]
+    common = sorted(words, key=word_set.get, reverse=True)[:5000]
+    cases = []
+    for _ in range(args.tokens):
+        kind = rng.random()
+        if kind < 0.5:
+            truth = (rng.choice(common), rng.choice(common))
+        elif kind < 0.8:
+            truth = tuple(rng.choice(common) for _ in range(rng.randint(3, 6)))
+        else:
+            truth = None
+        tok = "".join(truth) if truth else "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 20)))
+        cases.append((tok, truth))
+    cases = [(t, truth) for t, truth in cases if t not in word_set and len(t) >= 4]
+    tokens = [t for t, _ in cases]
+
+    def first_cut():
+        out = []
+        for low in tokens:
+            for cut in range(1, len(low)):
+                if low[:cut] in word_set and low[cut:] in word_set:
+                    out.append((low[:cut], low[cut:]))
+                    break
+            else:
+                out.append(None)
+        return out
+
+    def accuracy(results):
+        return sum(r == truth for r, (_, truth) in zip(results, cases)) / len(cases)
+
+    build_secs, segmenter = _best_of(
+        lambda: engine.WordSegmenter(word_set, dictionary.total), 1)
+    cut_secs, cut_results = _best_of(first_cut, args.repeat)
+    seg_secs, seg_results = _best_of(
+        lambda: [segmenter.segment(t) for t in tokens], args.repeat)
+
+    print(f"  tokens           {len(tokens):,}")
+    print(f"  segmenter build  {build_secs*1000:8.1f} ms  (once per process)")
+    print(f"  first cut        {cut_secs*1000:8.1f} ms  {accuracy(cut_results):7.2%} correct")
+    print(f"  segmentation     {seg_secs*1000:8.1f} ms  {accuracy(seg_results):7.2%} correct")
+
+    # Real books repeat the same OCR errors: replay a Zipf-distributed
+    # stream of the same tokens through the per-process repair cache
+    stream = rng.choices(tokens, weights=[1 / (r + 1) for r in range(len(tokens))],
+                         k=len(tokens))
+    uncached_secs, _ = _best_of(lambda: [segmenter.segment(t) for t in stream], 1)
+
+    def cached():
+        repairs = engine.RepairCache()
+        results = [repairs.get(t, segmenter.segment) for t in stream]
+        return results, repairs
+
+    cached_secs, (_, repairs) = _best_of(cached, args.repeat)
+    print(f"  zipf stream      {uncached_secs*1000:8.1f} ms  uncached")
+    print(f"  + repair cache   {cached_secs*1000:8.1f} ms  x{uncached_secs/cached_secs:.2f}  "
+          f"{repairs.hits / len(stream):.1%} hit rate")
+
+def _noisy_block(rng, words, size):
+    """About `size` chars of OCR-like text: hyphen breaks, ragged spacing, URLs, page numbers, merges"""
+    parts = []
+    total = 0
+    while total < size:
+        line = []
+        for _ in range(rng.randint(6, 14)):
+            r = rng.random()
+            w = rng.choice(words)
+            if r < 0.02:
+                w = f"https://example.com/{w}"
+            elif r < 0.03:
+                w = f"Page {rng.randint(1, 400)}"
+            elif r < 0.06:
+                w = w.capitalize() + rng.choice(words).capitalize()
+            elif r < 0.08:
+                w += str(rng.randint(1, 99))
+            line.append(w)
+        sep = rng.choice(["  ", " \t", " "])
+        end = rng.choice(["-\n", " \n ", "\n", ".\n\n", " \n"])
+        parts.append(sep.join(line) + end)
+        total += len(parts[-1])
+    return "".join(parts)
+
+def bench_regex(args):
+    """Original re.sub passes vs the compiled cleaning passes (Block 4)"""
+
+    print("="*60)
+    print("Block 4 — Artifact / Whitespace / Boundary Regexes")
+    print("="*60)
+
+    if args.file:
+        block = Path(args.file).read_text(encoding="utf-8")
+    else:
+        rng = random.Random(42)
+        words = [w for w in engine.load_dictionary().freqs if w.isalpha()][:20000]
+        block = _noisy_block(rng, words, 1 << 20)
+    text = block * max(1, int(args.mb * 1e6 / len(block)))
+
+    def before():
+        t = re.sub(r'http[s]?://\S+', '', text)
+        t = re.sub(r'www\.\S+', '', t)
+        t = re.sub(r'Page \d+', '', t, flags=re.I)
+        t = re.sub(r'[ \t]+', ' ', t)
+        t = re.sub(r' *\n *', '\n', t)
+        t = re.sub(r'([a-z])-\n([a-z])', r'\1\2', t)
+        t = re.sub(r'([a-z])([A-Z])', r'\1 \2', t)
+        t = re.sub(r'([A-Za-z])(\d)', r'\1 \2', t)
+        return re.sub(r'(\d)([A-Za-z])', r'\1 \2', t)
+
+    def after():
+        t = engine.remove_artifacts(text)
+        t = engine.normalize_whitespace(t)
+        return engine.protect_boundaries(t)
+
+    before_secs, expected = _best_of(before, 1)
+    after_secs, got = _best_of(after, 1)
+
+    assert got == expected, "compiled passes differ from the original ones"
+
+    mb = len(text) / 1e6
+    print(f"  input            {mb:8.1f} MB")
+    print(f"  9 re.sub passes  {before_secs:8.2f} s  {mb/before_secs:7.1f} MB/s")
+    print(f"  compiled passes  {after_secs:8.2f} s  {mb/after_secs:7.1f} MB/s  "
+          f"x{before_secs/after_secs:.2f}")
+
+def bench_clean(args):
+    """Serial vs sharded process-pool cleaning of a whole document (Block 4)"""
+
+    print("="*60)
+    print("Block 4 — Sharded Cleaning")
+    print("="*60)
+
+    dictionary = engine.load_dictionary()
+    if args.file:
+        block = Path(args.file).read_text(encoding="utf-8")
+    else:
+        rng = random.Random(42)
+        words = [w for w in dictionary.freqs if w.isalpha()][:20000]
+        block = _noisy_block(rng, words, 1 << 20)
+    copies = max(1, int(args.mb * 1e6 / len(block)))
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path = Path(tmp) / "raw_text.txt"
+        with open(src_path, "w", encoding="utf-8") as f:
+            for _ in range(copies):
+                f.write(block)
+        size = src_path.stat().st_size
+        dictionary.segmenter    # build before forking so workers inherit it
+
+        def run(workers):
+            window_chars = engine.CLEAN_WINDOW_CHARS
+            if workers > 1:
+                window_chars = max(engine.CLEAN_SHARD_MIN_CHARS,
+                                   min(window_chars, size // (workers * 4)))
+            with open(src_path, encoding="utf-8") as src:
+                return "".join(engine.clean_stream(
+                    src, dictionary, engine.Counter(), workers, window_chars))
+
+        baseline = None
+        for workers in worker_counts:
+            secs, text = _best_of(lambda: run(workers), 1)
+            if baseline is None:
+                baseline = secs
+                reference = text
+            assert text == reference, "cleaned text differs from the first run"
+
+            print(f"  workers={workers:<3} {secs:8.2f}s  "
+                  f"{size/1e6/secs:7.1f} MB/s  x{baseline/secs:.2f}")
+
+def bench_filter(args):
+    """Per-character symbol ratio vs byte-level symbol counts in the sentence filter (Blocks 5 & 6)"""
+
+    print("="*60)
+    print("Blocks 5 & 6 — Noisy Sentence Filter")
+    print("="*60)
+
+    block = Path(args.file).read_text(encoding="utf-8")
+    text = block * max(1, int(args.mb * 1e6 / max(len(block), 1)))
+    sentences = engine.SentenceSegmenter().split(text)
+
+    def before():
+        good = []
+        for s in sentences:
+            s = s.strip()
+            if len(s) < engine.MIN_SENTENCE_CHARS:
+                continue
+            sym_ratio = sum(not c.isalnum() and not c.isspace() for c in s) / max(len(s), 1)
+            if sym_ratio > engine.MAX_SYMBOL_RATIO:
+                continue
+            good.append(s)
+        return good
+
+    before_secs, expected = _best_of(before, 1)
+    after_secs, got = _best_of(lambda: list(engine.iter_good_sentences(sentences)), 1)
+
+    assert got == expected, "filter keeps different sentences"
+
+    mb = len(text) / 1e6
+    print(f"  input            {mb:8.1f} MB  {len(sentences):,} sentences, {len(got):,} kept")
+    print(f"  per character    {before_secs:8.2f} s  {mb/before_secs:7.1f} MB/s")
+    print(f"  symbol_count     {after_secs:8.2f} s  {mb/after_secs:7.1f} MB/s  "
+          f"x{before_secs/after_secs:.2f}")
+
+def bench_sentences(args):
+    """Plain regex split vs the sentence segmenter backends (Blocks 5 & 6)"""
+
+    print("="*60)
+    print("Blocks 5 & 6 — Sentence Segmentation")
+    print("="*60)
+
+    block = Path(args.file).read_text(encoding="utf-8")
+    text = block * max(1, int(args.mb * 1e6 / max(len(block), 1)))
+    mb = len(text) / 1e6
+    print(f"  input            {mb:8.1f} MB")
+
+    def kept(sentences):
+        return sum(1 for _ in engine.iter_good_sentences(sentences))
+
+    secs, sentences = _best_of(lambda: re.split(r'(?<=[.!?])\s+', text), 1)
+    print(f"  plain regex      {secs:8.2f} s  {mb/secs:7.1f} MB/s  "
+          f"{len(sentences):9,} sentences  {kept(sentences):9,} kept")
+
+    for backend in engine.SentenceSegmenter.BACKENDS:
+        try:
+            segmenter = engine.SentenceSegmenter(backend)
+        except LookupError as e:
+            print(f"  {backend:<16} skipped ({e})")
+            continue
+        secs, sentences = _best_of(lambda: segmenter.split(text), 1)
+        print(f"  {backend:<16} {secs:8.2f} s  {mb/secs:7.1f} MB/s  "
+              f"{len(sentences):9,} sentences  {kept(sentences):9,} kept")
+
+def bench_tokens(args):
+    """Token-budget chunking: cold vs cached per-word token counts (Blocks 5 & 6)"""
+
+    print("="*60)
+    print("Blocks 5 & 6 — Token-Budget Chunking")
+    print("="*60)
+
+    text = Path(args.file).read_text(encoding="utf-8")
+    tokenizer = engine.load_tokenizer(args.tokenizer)
+    budgets = [int(b) for b in args.budgets.split(",")]
+
+    def chunk(budget, counter):
+        return list(engine.iter_chunks([text], budget, engine.OVERLAP_WORDS,
+                                       engine.MIN_CHUNK_WORDS, word_tokens=counter))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "token_counts.json"
+        print(f"  tokenizer        {tokenizer.name}  {len(text)/1e6:.1f} MB")
+
+        for budget in budgets:
+            # Cold: a fresh per-word cache; warm: reloaded from disk, as a
+            # rerun at another budget would
+            cache_path.unlink(missing_ok=True)
+            cold = engine.TokenCounter(tokenizer, cache_path)
+            if isinstance(tokenizer, engine.BPETokenizer):
+                tokenizer._cache.clear()
+            cold_secs, expected = _best_of(lambda: chunk(budget, cold), 1)
+            cold.save()
+            warm_secs, got = _best_of(
+                lambda: chunk(budget, engine.TokenCounter(tokenizer, cache_path)), args.repeat)
+            assert got == expected, "cached counts chunk differently"
+
+            print(f"  budget={budget:<6} cold {cold_secs:7.3f}s  cached {warm_secs:7.3f}s  "
+                  f"x{cold_secs/warm_secs:.2f}  {len(got):,} chunks  {len(cold.counts):,} words")
+
+def bench_chunk(args):
+    """Chunking throughput and chunk quality across chunk sizes (Blocks 5 & 6)"""
+
+    print("="*60)
+    print("Blocks 5 & 6 — Chunk Size Sweep")
+    print("="*60)
+
+    text = Path(args.file).read_text(encoding="utf-8")
+    mb = len(text) / 1e6
+    print(f"  input            {mb:8.1f} MB")
+
+    for chunk_words in (int(w) for w in args.chunk_words.split(",")):
+        config = engine.PipelineConfig(
+            chunk_words=chunk_words,
+            overlap_words=min(args.overlap_words, chunk_words - 1),
+            min_chunk_words=min(engine.MIN_CHUNK_WORDS, chunk_words // 2),
+        )
+        secs, chunks = _best_of(lambda: list(engine.iter_chunks(
+            [text], config.chunk_words, config.overlap_words, config.min_chunk_words)),
+            args.repeat)
+        words = [len(c.split()) for c in chunks] or [0]
+
+        print(f"  chunk_words={chunk_words:<5} {secs:7.3f}s  {mb/secs:7.1f} MB/s  "
+              f"{len(chunks):7,} chunks  mean {statistics.mean(words):6.1f} words  "
+              f"{len(set(chunks)) / max(len(chunks), 1):7.2%} unique")
+
+def _all_pairs_duplicates(chunks, threshold):
+    """Reference near-duplicate search comparing every signature pair (NumPy)"""
+    import numpy as np
+
+    hasher = engine.MinHasher()
+    sigs = np.array([hasher.signature(engine.shingle_hashes(c)) for c in chunks])
+    kept, removed = [], set()
+    for i in range(len(sigs)):
+        if kept:
+            sims = (sigs[kept] == sigs[i]).mean(axis=1)
+            if sims.max() >= threshold:
+                removed.add(i)
+                continue
+        kept.append(i)
+    return removed
+
+def bench_dedup(args):
+    """MinHash LSH deduplication as the chunk count grows (Block 7)"""
+
+    print("="*60)
+    print("Block 7 — Chunk Deduplication")
+    print("="*60)
+
+    text = Path(args.file).read_text(encoding="utf-8")
+    chunks = list(engine.iter_chunks([text]))
+    rng = random.Random(0)
+
+    def near_copy(chunk):
+        words = chunk.split()
+        for _ in range(max(1, len(words) // 100)):
+            words[rng.randrange(len(words))] = "edited"
+        return " ".join(words)
+
+    print(f"  input            {len(chunks):,} chunks")
+    for copies in (int(c) for c in args.copies.split(",")):
+        corpus = chunks + [near_copy(c) for _ in range(copies - 1) for c in chunks]
+        secs, removed = _best_of(lambda: engine.find_duplicates(corpus, args.threshold), 1)
+        near = sum(1 for r in removed if r[2] == "near")
+        print(f"  x{copies:<3} {len(corpus):9,} chunks  {secs:7.2f}s  "
+              f"{len(corpus)/secs:9,.0f} chunks/s  {len(removed) - near:6,} exact  {near:6,} near")
+
+    if engine.has_module("numpy") and args.threshold < 1:
+        corpus = chunks + [near_copy(c) for c in chunks]
+        secs, expected = _best_of(lambda: _all_pairs_duplicates(corpus, args.threshold), 1)
+        lsh = {r[0] for r in engine.find_duplicates(corpus, args.threshold)}
+        print(f"  all pairs x2     {secs:7.2f}s  LSH recall "
+              f"{len(lsh & expected) / max(len(expected), 1):.2%}")
+
+def bench_export(args):
+    """Record file formats: pretty JSON arrays vs JSON Lines (Block 8)"""
+
+    print("="*60)
+    print("Block 8 — Export Formats")
+    print("="*60)
+
+    block = Path(args.file).read_text(encoding="utf-8")
+    text = block * max(1, int(args.mb * 1e6 / max(len(block), 1)))
+    chunks = list(engine.iter_chunks([text]))
+    records = [{"id": i, "text": c, "word_count": len(c.split())} for i, c in enumerate(chunks)]
+    print(f"  input            {len(text) / 1e6:8.1f} MB  {len(records):,} records")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, write in engine.EXPORT_WRITERS.items():
+            path = Path(tmp) / f"records.{fmt}"
+            secs, _ = _best_of(lambda: write(iter(records), path), args.repeat)
+            size = path.stat().st_size / 1e6
+            print(f"  {fmt:6} write     {secs:8.2f} s  {size:8.1f} MB  {size / secs:7.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset pipeline benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("extract", help="digital PDF extraction")
+    p.add_argument("file")
+    p.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_extract)
+
+    p = sub.add_parser("startup", help="cold start of a text-only job")
+    p.add_argument("file", nargs="?")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("dictionary", help="dictionary load (text vs compiled)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_dictionary)
+
+    p = sub.add_parser("split", help="dictionary split pass (first cut vs segmentation)")
+    p.add_argument("--tokens", type=int, default=200000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_split)
+
+    p = sub.add_parser("regex", help="cleaning regexes (original vs compiled passes)")
+    p.add_argument("file", nargs="?")
+    p.add_argument("--mb", type=float, default=100)
+    p.set_defaults(func=bench_regex)
+
+    p = sub.add_parser("clean", help="whole-document cleaning (serial vs sharded)")
+    p.add_argument("file", nargs="?")
+    p.add_argument("--mb", type=float, default=100)
+    p.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    p.set_defaults(func=bench_clean)
+
+    p = sub.add_parser("filter", help="noisy sentence filter (per character vs symbol_count)")
+    p.add_argument("file")
+    p.add_argument("--mb", type=float, default=100)
+    p.set_defaults(func=bench_filter)
+
+    p = sub.add_parser("sentences", help="sentence segmentation backends")
+    p.add_argument("file")
+    p.add_argument("--mb", type=float, default=20)
+    p.set_defaults(func=bench_sentences)
+
+    p = sub.add_parser("tokens", help="token-budget chunking (cold vs cached counts)")
+    p.add_argument("file")
+    p.add_argument("--tokenizer", default="whitespace")
+    p.add_argument("--budgets", default="256,512,1024")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_tokens)
+
+    p = sub.add_parser("chunk", help="chunking sweep over chunk sizes")
+    p.add_argument("file")
+    p.add_argument("--chunk-words", default="120,180,256")
+    p.add_argument("--overlap-words", type=int, default=engine.OVERLAP_WORDS)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_chunk)
+
+    p = sub.add_parser("dedup", help="MinHash LSH deduplication (scaling, recall vs all pairs)")
+    p.add_argument("file")
+    p.add_argument("--copies", default="1,2,4")
+    p.add_argument("--threshold", type=float, default=engine.DEDUP_THRESHOLD)
+    p.set_defaults(func=bench_dedup)
+
+    p = sub.add_parser("export", help="record files (JSON arrays vs JSON Lines)")
+    p.add_argument("file")
+    p.add_argument("--mb", type=float, default=50)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ This script combines all blocks (1-9) from your notebook into a single
 executable Python script that can be called from a Vite/Tauri UI.
 
 Usage:
-    python pipeline_engine.py <path_to_pdf_or_txt_file>
+    python pipeline_engine.py <path_to_pdf_or_txt_file> [--chunk-words N ...]
+    python pipeline_engine.py --worker [--preload-ocr]   (NDJSON job server)
+    python pipeline_engine.py --build-dictionary         (compile dictionary)
     
 The script will:
 1. Setup directories and check dependencies
@@ -21,7 +23,6 @@ The script will:
 
 import sys
 import os
-import subprocess
 import shutil
 from pathlib import Path
 import json
@@ -29,7 +30,17 @@ import re
 import warnings
 import random
 import statistics
-from collections import Counter
+import time
+import math
+import zlib
+import hashlib
+from collections import Counter, OrderedDict, deque
+from collections.abc import Sequence
+from functools import lru_cache, cached_property
+from dataclasses import dataclass, field, fields, replace
+import importlib.util
+import struct
+from array import array
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
@@ -38,8 +49,15 @@ warnings.filterwarnings("ignore")
 # HELPER FUNCTIONS
 # ============================================================================
 
+# When set (worker mode), log messages go to this callable instead of stdout
+_log_sink = None
+
 def log(message):
     """Helper to send logs to the UI in real-time"""
+    if _log_sink is not None:
+        _log_sink(message)
+        return
+
     # Encode safely for Windows terminal (some systems can't handle emoji)
     try:
         print(f"LOG: {message}", flush=True)
@@ -54,302 +72,1053 @@ def save_json(obj, path: Path):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
 
+def save_json_array(items, path: Path):
+    """
+    Stream an iterable to path as a JSON array, byte-identical to
+    save_json(list(items), path) but without building the list.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(",\n  " if count else "[\n  ")
+            f.write(json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "[]")
+    return count
+
+_jsonl_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+def save_jsonl(items, path: Path):
+    """Stream an iterable to path as JSON Lines (one compact record per line)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for item in items:
+            f.write(_jsonl_encode(item))
+            f.write("\n")
+            count += 1
+    return count
+
+@lru_cache(maxsize=None)
+def has_module(name):
+    """
+    Cached capability check: is `name` importable? Uses find_spec so the
+    module (e.g. paddle, hundreds of MB) is never actually imported here.
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+# Optional libraries and what they enable (probed on demand, never imported)
+OPTIONAL_LIBS = {
+    'fitz': 'PyMuPDF (PDF extraction)',
+    'numpy': 'NumPy (OCR page rendering, MinHash)',
+    'paddleocr': 'PaddleOCR (OCR fallback)',
+    'paddle': 'PaddlePaddle (OCR backend)',
+    'nltk': 'NLTK',
+}
+
+def capabilities():
+    """{module: available} for every optional library"""
+    return {name: has_module(name) for name in OPTIONAL_LIBS}
+
 # ============================================================================
-# MAIN PIPELINE FUNCTION
+# DICTIONARY
 # ============================================================================
 
-def run_pipeline(source_file_path):
+DICT_PATH = Path(__file__).parent / "dictionaries" / "frequency_dictionary_en_82_765.txt"
+
+# Compiled artifact layout (little-endian):
+#   header   magic (8 bytes), word count (uint32), blob length (uint32)
+#   freqs    uint64 per word, in sorted word order
+#   blob     sorted words as UTF-8, newline separated
+DICT_MAGIC = b"FDICT01\0"
+DICT_HEADER = struct.Struct("<8sII")
+
+def compiled_dict_path(dict_path=DICT_PATH):
+    return dict_path.with_suffix(".bin")
+
+def read_dictionary_text(dict_path=DICT_PATH):
     """
-    Main pipeline execution function
-    Combines Blocks 1-9 from the original notebook
+    Parse the text frequency dictionary ("word count" per line) into a
+    word → count dict. Words are lower-cased; duplicates keep the highest
+    count.
     """
-    
-    source_path = Path(source_file_path)
-    
-    if not source_path.exists():
-        log(f"[ERROR] File not found at {source_path}")
-        return False
+    freqs = {}
+
+    # utf-8-sig: the bundled file starts with a BOM that would otherwise
+    # glue itself to the first word ("the")
+    with open(dict_path, encoding="utf-8-sig") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            w = parts[0].lower()
+            n = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            if n >= freqs.get(w, -1):
+                freqs[w] = n
 
-    # ========================================================================
-    # BLOCK 1: DIRECTORY SETUP & PIPELINE GUARD
-    # ========================================================================
-    
-    log("[START] Starting Dataset Pipeline")
-    log("="*60)
-    
-    # Use the parent directory of the script to find the 'data' folder
-    BASE_DIR = Path(__file__).parent.parent if hasattr(Path(__file__), 'parent') else Path.cwd()
-    DATA_DIR = BASE_DIR / "data"
-    CACHE_DIR = BASE_DIR / "cache"
-    DATASET_DIR = BASE_DIR / "datasets"
-    OUTPUT_DIR = BASE_DIR / "outputs"
-    
-    # Ensure folders exist
-    for d in [DATA_DIR, CACHE_DIR, OUTPUT_DIR, DATASET_DIR]:
-        d.mkdir(parents=True, exist_ok=True)
-    
-    log(f"[INFO] Working Directory: {BASE_DIR}")
-    log(f"[INFO] Folders ready: data, cache, outputs, datasets")
-    
-    state_file = CACHE_DIR / "pipeline_state.json"
-    state = {}
-    
-    if state_file.exists():
-        state = json.loads(state_file.read_text())
-    
-        # Use uploaded file directly (no duplication into data/)
-    target_pdf = source_path
-    log(f"[INFO] Using source file directly: {target_pdf.name}")
+    return freqs
+
+def build_dictionary(dict_path=DICT_PATH, out_path=None):
+    """
+    Compile the text frequency dictionary into the binary artifact.
+    Written atomically, so concurrent builders are safe.
+    """
+    out_path = out_path or compiled_dict_path(dict_path)
+    freqs = read_dictionary_text(dict_path)
+
+    words = sorted(freqs)
+    blob = "\n".join(words).encode("utf-8")
+    counts = array("Q", (freqs[w] for w in words))
+    if sys.byteorder != "little":
+        counts.byteswap()
+
+    tmp = out_path.with_name(f"{out_path.name}.tmp-{os.getpid()}")
+    with open(tmp, "wb") as f:
+        f.write(DICT_HEADER.pack(DICT_MAGIC, len(words), len(blob)))
+        f.write(counts.tobytes())
+        f.write(blob)
+    os.replace(tmp, out_path)
+
+    return out_path
+
+SEGMENT_MAX_WORD = 24    # longest dictionary word a segment may be
+
+class WordSegmenter:
+    """
+    Splits run-together OCR tokens ("inthebeginning" → in the beginning)
+    into any number of dictionary words.
+
+    Viterbi over unigram log-probabilities: best[i] memoizes the cheapest
+    segmentation of word[:i], where a word costs -log(freq / total). From
+    each position one walk down a character trie yields every dictionary
+    word starting there, at most `max_word` characters long, so a token is
+    segmented in O(len × max_word).
+    """
+
+    def __init__(self, freqs, total, max_word=SEGMENT_MAX_WORD):
+        self.max_word = max_word
+        self.trie = {}
+        log_total = math.log(total or 1)
+
+        for w, f in freqs.items():
+            node = self.trie
+            for ch in w:
+                nxt = node.get(ch)
+                if nxt is None:
+                    nxt = node[ch] = {}
+                node = nxt
+            node[None] = log_total - math.log(f or 1)    # end of word: its cost
+
+    def segment(self, word):
+        """Most probable split of word into two or more words, or None"""
+        n = len(word)
+        trie = self.trie
+        max_word = self.max_word
+        inf = float("inf")
+        best = [0.0] + [inf] * n
+        back = [0] * (n + 1)
+
+        for i in range(n):
+            base = best[i]
+            if base == inf:
+                continue
+
+            node = trie
+            for j in range(i, min(n, i + max_word)):
+                node = node.get(word[j])
+                if node is None:
+                    break
+                cost = node.get(None)
+                if cost is not None and base + cost < best[j + 1]:
+                    best[j + 1] = base + cost
+                    back[j + 1] = i
+
+        if best[n] == inf:
+            return None
+
+        pieces = []
+        j = n
+        while j:
+            i = back[j]
+            pieces.append(word[i:j])
+            j = i
+
+        if len(pieces) < 2:
+            return None
+
+        return tuple(reversed(pieces))
+
+REPAIR_CACHE_SIZE = int(os.environ.get("PIPELINE_REPAIR_CACHE", "100000"))
+
+class RepairCache:
+    """
+    Bounded LRU memo of token → repair decision. OCR errors repeat all
+    through a book and across books, so the worker keeps one per process
+    and every job reuses the decisions of the jobs before it.
+    """
+
+    def __init__(self, maxsize=REPAIR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Cached decision for key, computing (and storing) it on a miss"""
+        entries = self.entries
 
-    
-    current_pdf = target_pdf.name
-    last_pdf = state.get("pdf")
-    
-    log(f"[INFO] Current File: {current_pdf}")
-    
-    # Detect new vs old file
-    if last_pdf == current_pdf:
-        log("[OK] Same file as last run — keeping cache & outputs")
-        CLEAN_REQUIRED = False
-    else:
-        log("[NEW] New file detected — cleaning old cache/datasets/outputs")
-        
-        for folder in [CACHE_DIR, DATASET_DIR, OUTPUT_DIR]:
-            if folder.exists():
-                for item in folder.iterdir():
-                    if item != state_file:  # Don't delete state file yet
-                        if item.is_file():
-                            item.unlink()
-                        else:
-                            shutil.rmtree(item)
-        
-        CLEAN_REQUIRED = True
-        state = {"pdf": current_pdf, "stage": "init"}
-        CACHE_DIR.mkdir(exist_ok=True)
-        state_file.write_text(json.dumps(state, indent=2))
-    
-    log("[OK] Pipeline guard check complete")
-    
-    # ========================================================================
-    # BLOCK 2: ENVIRONMENT & DEPENDENCY CHECK
-    # ========================================================================
-    
-    log("="*60)
-    log("[CHECK] Checking dependencies...")
-    
-    # Poppler path config (for pdf2image fallback)
-    poppler_paths = [
-        r"C:\Program Files\poppler\Library\bin",
-        r"C:\Program Files (x86)\poppler\Library\bin",
-    ]
-    
-    poppler_found = False
-    for path in poppler_paths:
-        if os.path.exists(path):
-            os.environ['PATH'] = path + ';' + os.environ['PATH']
-            poppler_found = True
-            log(f"   [OK] Poppler found at: {path}")
-            break
-    
-    if not poppler_found:
-        log("   [WARN] Poppler not found (optional — PyMuPDF still works)")
-    
-    # PaddleOCR check
-    try:
-        import paddleocr
-        log("   [OK] PaddleOCR installed")
-        paddle_ok = True
-    except:
-        log("   [WARN] PaddleOCR not installed (will use digital extraction only)")
-        paddle_ok = False
-    
-    # Library checks
-    required_libs = {
-        'PyPDF2': 'PyPDF2',
-        'nltk': 'nltk',
-        'pandas': 'pandas',
-        'pdf2image': 'pdf2image',
-        'fitz': 'PyMuPDF',
-    }
-    
-    log("[INFO] Library Status:")
-    for lib_import, lib_name in required_libs.items():
         try:
-            __import__(lib_import)
-            log(f"   [OK] {lib_name} OK")
-        except:
-            log(f"   [WARN] {lib_name} missing")
-    # ========================================================================
-    # ========================================================================
-    # BLOCK 3: PDF TEXT EXTRACTION (DIGITAL → PADDLE OCR FALLBACK) — FIXED
-    # ========================================================================
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            value = entries[key] = compute(key)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+            return value
+
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def stats(self):
+        return self.hits, self.misses
+
+class FrequencyDictionary:
+    """
+    Word → corpus frequency table, loaded from the compiled .bin artifact
+    (or parsed from the text source when no artifact is available).
 
-    log("="*60)
-    log("[EXTRACT] BLOCK 3 — Extracting text from file")
+    Each process holds its own `freqs` dict: membership tests run once per
+    token in the cleaning loops, and a dict keeps them at C speed.
+    """
 
-    pdf_path = target_pdf
+    def __init__(self, freqs):
+        self.freqs = freqs
+        self.total = sum(freqs.values())
+
+    @classmethod
+    def load(cls, path):
+        """Read a compiled artifact written by build_dictionary"""
+        with open(path, "rb") as f:
+            header = f.read(DICT_HEADER.size)
+            if len(header) < DICT_HEADER.size:
+                raise ValueError(f"{path.name}: truncated dictionary")
+            magic, count, blob_len = DICT_HEADER.unpack(header)
+            if magic != DICT_MAGIC:
+                raise ValueError(f"{path.name}: not a compiled dictionary")
+
+            counts = array("Q")
+            counts.fromfile(f, count)
+            if sys.byteorder != "little":
+                counts.byteswap()
+
+            blob = f.read(blob_len)
+            words = blob.decode("utf-8").split("\n") if count else []
+
+        if len(words) != count:
+            raise ValueError(f"{path.name}: corrupt dictionary")
+        return cls(dict(zip(words, counts)))
+
+    @classmethod
+    def from_text(cls, dict_path=DICT_PATH):
+        return cls(read_dictionary_text(dict_path))
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def __contains__(self, word):
+        return word in self.freqs
+
+    def freq(self, word):
+        return self.freqs.get(word, 0)
+
+    @cached_property
+    def digest(self):
+        """Content hash of the words and counts, whichever file they came from"""
+        words = sorted(self.freqs)
+        h = hashlib.blake2b(digest_size=16)
+        h.update("\n".join(words).encode("utf-8"))
+        h.update(b"\0")
+        h.update(array("Q", (self.freqs[w] for w in words)).tobytes())
+        return h.hexdigest()
+
+    @cached_property
+    def segmenter(self):
+        """Word segmenter for the split pass, built on first use"""
+        return WordSegmenter(self.freqs, self.total)
+
+    @cached_property
+    def repairs(self):
+        """Per-process repair decision cache (decisions depend on this dictionary)"""
+        return RepairCache()
+
+@lru_cache(maxsize=None)
+def load_dictionary(dict_path=DICT_PATH):
+    """
+    The frequency dictionary, loaded once per process and kept warm across
+    jobs. The binary artifact is (re)built first if it is missing or older
+    than the text source; if it cannot be written or read (e.g. a
+    read-only install), the text source is parsed instead. Returns None if
+    the dictionary is not available.
+    """
+    bin_path = compiled_dict_path(dict_path)
+    if not dict_path.exists() and not bin_path.exists():
+        return None
 
     try:
-        import fitz
-    except:
-        log("[ERROR] PyMuPDF (fitz) not installed")
-        return False
+        if dict_path.exists() and (
+            not bin_path.exists()
+            or bin_path.stat().st_mtime < dict_path.stat().st_mtime
+        ):
+            log(f"[DICT] Compiling {dict_path.name} → {bin_path.name}")
+            build_dictionary(dict_path, bin_path)
 
-    method_used = "unknown"
+        return FrequencyDictionary.load(bin_path)
 
-    if pdf_path.suffix.lower() == ".pdf":
-        log("[INFO] Processing PDF file...")
+    except (OSError, ValueError, EOFError) as e:
+        if not dict_path.exists():
+            log(f"[DICT] Could not load dictionary: {e}")
+            return None
+        log(f"[DICT] Compiled dictionary unavailable ({e}) — parsing {dict_path.name}")
 
-        doc = fitz.open(pdf_path)
-        digital_text_parts = []
+    try:
+        return FrequencyDictionary.from_text(dict_path)
+    except (OSError, ValueError) as e:
+        log(f"[DICT] Could not load dictionary: {e}")
+        return None
 
-        for page_num, page in enumerate(doc, start=1):
-            blocks = page.get_text("blocks")
-            blocks.sort(key=lambda b: (round(b[1],1), round(b[0],1)))
+# ============================================================================
+# PDF EXTRACTION HELPERS
+# ============================================================================
+
+# Worker processes for digital extraction (0 = one per CPU core)
+EXTRACT_WORKERS = int(os.environ.get("PIPELINE_EXTRACT_WORKERS", "0"))
+
+# Below this page count a process pool costs more to start than it saves
+PARALLEL_MIN_PAGES = 32
 
-            page_lines = []
-            for b in blocks:
-                t = b[4].strip()
-                if t:
-                    page_lines.append(t)
+def page_block_text(page):
+    """Digital text of one page, blocks ordered top → bottom, left → right"""
+    blocks = page.get_text("blocks")
+    blocks.sort(key=lambda b: (round(b[1],1), round(b[0],1)))
 
-            digital_text_parts.append("\n".join(page_lines))
+    page_lines = []
+    for b in blocks:
+        t = b[4].strip()
+        if t:
+            page_lines.append(t)
 
-        digital_text = "\n\n".join(digital_text_parts).strip()
+    return "\n".join(page_lines)
+
+def _extract_page_range(pdf_path, start, stop):
+    """Pool worker: open a private fitz handle and extract pages [start, stop)"""
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        return [page_block_text(doc[i]) for i in range(start, stop)]
+
+def extract_digital_pages(pdf_path, workers=None):
+    """
+    Extract block-ordered digital text for every page of a PDF.
 
-        log(f"[INFO] Digital text length: {len(digital_text)} characters")
+    Page ranges are spread over a ProcessPoolExecutor (each worker opens its
+    own fitz document) and the results come back in page order. Small
+    documents, or workers=1, use the serial path.
+    """
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    workers = workers or EXTRACT_WORKERS or os.cpu_count() or 1
+    workers = min(workers, page_count)
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        return _extract_page_range(str(pdf_path), 0, page_count)
+
+    # A few ranges per worker keeps the pool balanced when pages vary in cost
+    step = max(1, -(-page_count // (workers * 4)))
+    ranges = [(s, min(s + step, page_count)) for s in range(0, page_count, step)]
+
+    try:
+        from concurrent.futures import ProcessPoolExecutor
 
-        DIGITAL_THRESHOLD = 1200
-        use_ocr = len(digital_text) < DIGITAL_THRESHOLD
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(
+                _extract_page_range,
+                [str(pdf_path)] * len(ranges),
+                [r[0] for r in ranges],
+                [r[1] for r in ranges],
+            )
+            pages = [t for part in parts for t in part]
 
-        if use_ocr and paddle_ok:
-            log("[INFO] Digital text weak — switching to PaddleOCR fallback")
+        log(f"[INFO] Parallel extraction: {page_count} pages, {workers} workers")
+        return pages
+
+    except Exception as e:
+        log(f"[WARN] Parallel extraction failed ({e}), using serial path")
+        return _extract_page_range(str(pdf_path), 0, page_count)
+
+# A page whose digital layer has fewer alphanumeric characters than this is
+# treated as scanned and sent to OCR
+PAGE_DIGITAL_MIN_CHARS = 100
+
+def page_text_score(text):
+    """Digital text density of a page: number of alphanumeric characters"""
+    return sum(c.isalnum() for c in text)
+
+# Render resolution for OCR pages and how many rendered pages may wait for OCR
+OCR_DPI = int(os.environ.get("PIPELINE_OCR_DPI", "200"))
+OCR_PREFETCH_PAGES = 8
+
+def iter_page_images(pdf_path, page_indexes, dpi=None):
+    """
+    Render the given (0-based) pages one at a time with PyMuPDF.
+
+    Yields (page_index, image) where image is an HxWx3 uint8 BGR array, the
+    layout PaddleOCR expects. Only one page is rasterized per step, so no
+    Poppler install and no whole-document image list is needed.
+    """
+    import fitz
+    import numpy as np
+
+    zoom = (dpi or OCR_DPI) / 72
+    matrix = fitz.Matrix(zoom, zoom)
+
+    with fitz.open(pdf_path) as doc:
+        for idx in page_indexes:
             try:
-                from paddleocr import PaddleOCR
-                from pdf2image import convert_from_path
+                pix = doc[idx].get_pixmap(matrix=matrix, alpha=False)
+            except Exception as e:
+                log(f"   [WARN] Render failed on page {idx+1}: {e}")
+                continue
 
-                ocr = PaddleOCR(use_angle_cls=True, lang="en", show_log=False)
-                images = convert_from_path(pdf_path)
+            img = np.frombuffer(pix.samples, dtype=np.uint8)
+            img = img.reshape(pix.height, pix.width, pix.n)
+            # RGB → BGR; copy so the pixmap buffer can be released
+            yield idx, img[:, :, ::-1].copy()
 
-                ocr_parts = []
+def prefetch(iterable, size):
+    """
+    Run `iterable` in a producer thread, at most `size` items ahead of the
+    consumer. Producer exceptions are re-raised in the consumer.
+    """
+    import queue
+    import threading
 
-                for i, img in enumerate(images):
-                    log(f"   [INFO] OCR page {i+1}/{len(images)}")
-                    result = ocr.ocr(img, cls=True)
+    q = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
 
-                    words = []
-                    for line in result:
-                        for w in line:
-                            words.append(w[1][0])
+    def _put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((None, item)):
+                    return
+        except BaseException as e:
+            _put((e, None))
+            return
+        _put((None, done))
 
-                    ocr_parts.append(" ".join(words))
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            err, item = q.get()
+            if err is not None:
+                raise err
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+# Pages handed to the OCR engine per batch, and text-line crops per
+# recognizer forward pass inside PaddleOCR
+OCR_BATCH_PAGES = int(os.environ.get("PIPELINE_OCR_BATCH", "4"))
+OCR_REC_BATCH = 16
+
+def batched(iterable, size):
+    """Group an iterable into lists of at most `size` items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class OCREngine:
+    """
+    PaddleOCR model that is loaded once per process and kept warm.
 
-                final_text = "\n\n".join(ocr_parts)
-                method_used = "paddle_ocr"
+    Use OCREngine.get() rather than constructing it, so every job in a
+    process (or pipeline worker) shares the same loaded model. Counters
+    accumulate over the life of the process.
+    """
 
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, lang="en"):
+        from paddleocr import PaddleOCR
+
+        t0 = time.perf_counter()
+        self._ocr = PaddleOCR(
+            use_angle_cls=True, lang=lang, show_log=False,
+            rec_batch_num=OCR_REC_BATCH,
+        )
+        self.load_seconds = time.perf_counter() - t0
+        self.pages = 0
+        self.seconds = 0.0
+
+        log(f"[OCR] PaddleOCR model loaded in {self.load_seconds:.2f}s")
+
+    def recognize(self, img):
+        """OCR one page image, returning its words joined by spaces"""
+        result = self._ocr.ocr(img, cls=True)
+
+        words = []
+        for line in result or []:
+            for w in line or []:
+                words.append(w[1][0])
+
+        return " ".join(words)
+
+    def recognize_batch(self, images):
+        """
+        OCR a batch of page images. PaddleOCR's detector takes one image
+        per call, so pages run back to back on the warm model; a failed
+        page yields None instead of aborting the batch.
+        """
+        t0 = time.perf_counter()
+        texts = []
+
+        for img in images:
+            try:
+                texts.append(self.recognize(img))
             except Exception as e:
-                log(f"[WARN] OCR failed: {e}, using digital text")
-                final_text = digital_text
-                method_used = "digital_fallback"
-        else:
-            log("[OK] Using digital block extraction")
-            final_text = digital_text
-            method_used = "digital_block"
+                log(f"   [WARN] OCR failed: {e}")
+                texts.append(None)
 
-    else:
-        log("[INFO] Reading text file...")
+        self.seconds += time.perf_counter() - t0
+        self.pages += len(images)
+        return texts
+
+    def pages_per_sec(self):
+        return self.pages / self.seconds if self.seconds else 0.0
+
+def ocr_pages(pdf_path, page_indexes, dpi=None):
+    """
+    OCR only the given (0-based) pages with the shared OCREngine.
+
+    Pages are rendered in batches by a bounded producer thread while the
+    previous batch is being recognised, so rendering overlaps inference and
+    peak memory stays at a few page images whatever the page count.
+
+    Returns ({page_index: text}, metrics). Pages that fail are left out so
+    the caller can keep their digital text.
+    """
+    t0 = time.perf_counter()
+    engine = OCREngine.get()
+    warm_start = time.perf_counter()
+
+    results = {}
+    done = 0
+
+    renders = batched(iter_page_images(pdf_path, page_indexes, dpi), OCR_BATCH_PAGES)
+
+    for batch in prefetch(renders, max(1, OCR_PREFETCH_PAGES // OCR_BATCH_PAGES)):
+        texts = engine.recognize_batch([img for _, img in batch])
+
+        for (idx, _), text in zip(batch, texts):
+            if text is not None:
+                results[idx] = text
+
+        done += len(batch)
+        log(f"   [INFO] OCR pages {done}/{len(page_indexes)}")
+
+    elapsed = time.perf_counter() - warm_start
+    metrics = {
+        "pages": done,
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(done / elapsed, 2) if elapsed else 0.0,
+        "model_load_seconds": round(warm_start - t0, 2),
+        "process_pages_per_sec": round(engine.pages_per_sec(), 2),
+    }
+    log(f"[OCR] {done} pages in {elapsed:.1f}s — {metrics['pages_per_sec']} pages/s")
+
+    return results, metrics
+
+# ============================================================================
+# EXTRACTION CACHE (CONTENT-ADDRESSED)
+# ============================================================================
+
+# raw_text.txt per source file, keyed by a BLAKE2 hash of the file bytes
+EXTRACT_CACHE_NAME = "extract"
+EXTRACT_CACHE_MAX_BYTES = int(os.environ.get("PIPELINE_EXTRACT_CACHE_MB", "512")) * 1024 * 1024
+
+def file_digest(path):
+    """BLAKE2b hex digest of a file's contents, read in 1 MB blocks"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def extract_cache_get(cache_dir, digest, params):
+    """
+    Return (text, meta) for a cached extraction, or None on a miss.
+
+    An entry only counts as a hit if it was extracted with the same
+    params. Hits are touched so eviction is least-recently-used.
+    """
+    text_path = cache_dir / f"{digest}.txt"
+    meta_path = cache_dir / f"{digest}.json"
+
+    if not (text_path.exists() and meta_path.exists()):
+        return None
+
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("params") != params:
+            return None
+        text = text_path.read_text(encoding="utf-8")
+        os.utime(text_path)
+        os.utime(meta_path)
+    except (OSError, ValueError):
+        return None
+
+    return text, meta
+
+def extract_cache_put(cache_dir, digest, text, meta, max_bytes=None):
+    """Store an extraction atomically, then evict LRU entries over the size limit"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    for suffix, payload in ((".txt", text), (".json", json.dumps(meta, indent=2))):
+        tmp = cache_dir / f"{digest}{suffix}.tmp-{os.getpid()}"
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, cache_dir / f"{digest}{suffix}")
+
+    evict_extract_cache(cache_dir, max_bytes or EXTRACT_CACHE_MAX_BYTES)
+
+def evict_extract_cache(cache_dir, max_bytes):
+    """Delete least-recently-used entries until the cache fits in max_bytes"""
+    entries = []
+    total = 0
+
+    for text_path in cache_dir.glob("*.txt"):
+        meta_path = text_path.with_suffix(".json")
         try:
-            final_text = pdf_path.read_text(encoding="utf-8", errors="replace")
-            method_used = "text_file"
-        except Exception as e:
-            log(f"[ERROR] File Read Error: {e}")
+            st = text_path.stat()
+            size = st.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, size, text_path, meta_path))
+        total += size
+
+    entries.sort()
+    evicted = 0
+
+    # Never evict the newest entry, even if it alone is over the limit
+    for mtime, size, text_path, meta_path in entries[:-1]:
+        if total <= max_bytes:
+            break
+        for path in (text_path, meta_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        total -= size
+        evicted += 1
+
+    if evicted:
+        log(f"[CACHE] Evicted {evicted} extraction(s), cache now {total/1e6:.1f} MB")
+
+# ============================================================================
+# JOB WORKSPACES
+# ============================================================================
+
+# Every job works in jobs/<job_id>/{cache,datasets,outputs}; only the
+# content-addressed extraction cache (cache/extract) is shared
+JOBS_DIR_NAME = "jobs"
+MAX_WORKSPACES = int(os.environ.get("PIPELINE_MAX_WORKSPACES", "20"))
+LOCK_NAME = ".lock"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+class WorkspaceLock:
+    """
+    Exclusive lock on a job workspace (a lock file created with O_EXCL).
+
+    A second run for the same workspace waits until the first finishes. A
+    lock left behind by a dead process is taken over.
+    """
+
+    def __init__(self, work_dir, poll=0.5):
+        self.path = work_dir / LOCK_NAME
+        self.poll = poll
+
+    def __enter__(self):
+        waiting = False
+
+        while True:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileNotFoundError:
+                continue    # workspace was pruned under us; recreate it
+            except FileExistsError:
+                try:
+                    owner = int(self.path.read_text() or 0)
+                except (OSError, ValueError):
+                    owner = 0
+                if owner and not _pid_alive(owner):
+                    log(f"[JOB] Removing stale lock from pid {owner}")
+                    self.path.unlink(missing_ok=True)
+                    continue
+                if not waiting:
+                    log("[JOB] Workspace busy — waiting for the running job")
+                    waiting = True
+                time.sleep(self.poll)
+                continue
+
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return self
+
+    def try_acquire(self):
+        """Take the lock only if it is free now; False if busy or the workspace is gone"""
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
             return False
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
 
+    def __exit__(self, *exc):
+        self.path.unlink(missing_ok=True)
 
-    raw_path = DATASET_DIR / "raw_text.txt"
-    raw_path.write_text(final_text, encoding="utf-8")
+def remove_workspace(work_dir):
+    """
+    Delete a workspace atomically: it is first renamed out of jobs/ (one
+    rename), so readers see either the whole workspace or nothing.
+    """
+    trash = work_dir.with_name(f".trash-{work_dir.name}-{os.getpid()}")
+    try:
+        os.replace(work_dir, trash)
+    except OSError:
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
 
-    log(f"[INFO] Saved: {raw_path.name}")
-    log(f"[INFO] Method: {method_used}")
-    log(f"[INFO] Final text length: {len(final_text)} characters")
+def prune_workspaces(jobs_dir, keep, current=None):
+    """
+    Remove least-recently-used idle workspaces beyond `keep`.
 
-    state = json.loads(state_file.read_text())
-    state["stage"] = "text_extracted"
-    state["method"] = method_used
-    state_file.write_text(json.dumps(state, indent=2))
+    Concurrent runs may prune at the same time, so workspaces can vanish
+    while this looks at them. Each one is locked before it is removed; a
+    workspace whose lock is taken (a job is running there) is skipped.
+    """
+    try:
+        entries = list(jobs_dir.iterdir())
+    except OSError:
+        return
+    workspaces = []
+    for d in entries:
+        if d.name.startswith(".") or d == current:
+            continue
+        try:
+            if d.is_dir():
+                workspaces.append((d.stat().st_mtime, d))
+        except OSError:
+            continue    # removed by another pruner meanwhile
+    workspaces.sort(key=lambda item: item[0], reverse=True)
+
+    # The current job counts towards the limit
+    for _, old in workspaces[max(keep - 1, 0):]:
+        if not WorkspaceLock(old).try_acquire():
+            continue
+        # The lock file is renamed away with the workspace
+        if remove_workspace(old):
+            log(f"[JOB] Pruned old workspace: {old.name}")
+        else:
+            (old / LOCK_NAME).unlink(missing_ok=True)
 
-    log("[OK] BLOCK 3 COMPLETE — TEXT READY")
+# ============================================================================
+# TEXT CLEANING (BLOCK 4)
+# ============================================================================
 
-    # ========================================================================
-    # BLOCK 4: SAFE CLEAN + DICTIONARY JOIN + SPLIT + DROPCAP + METRICS
-    # ========================================================================
+# Character normalization (Block 4): ligature expansion, typographic
+# quotes/dashes/ellipsis, zero-width junk. Later stages rely on
+# clean_text.txt being normalized already.
+NORMALIZE_TABLE = {
+    'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬀ': 'ff', 'ﬃ': 'ffi', 'ﬄ': 'ffl',
+    '’': "'", '‘': "'", '“': '"', '”': '"',
+    '–': '-', '—': '-', '−': '-', '…': '...',
+    '\u200b': '', '\u200c': '', '\u200d': '', '\ufeff': '',
+}
+
+# One scan for all table characters. str.translate would be simpler, but
+# on non-ASCII text it looks up every character in Python and runs over
+# 10x slower than skipping to the few characters that actually change.
+NORMALIZE_RE = re.compile("[" + "".join(NORMALIZE_TABLE) + "]")
+
+def normalize_chars(text):
+    """Apply NORMALIZE_TABLE"""
+    return NORMALIZE_RE.sub(lambda m: NORMALIZE_TABLE[m.group()], text)
+
+# Cleaning patterns (Block 4), compiled once at import. Each pattern only
+# matches text it actually changes, and starts with a literal where it can
+# so the scanner jumps between candidates instead of trying every position.
+ARTIFACT_PATTERNS = (
+    re.compile(r'https?://\S+'),
+    re.compile(r'www\.\S+'),
+    re.compile(r'Page \d+', re.I),
+)
+
+SPACE_RUN_RE = re.compile(r'\t[ \t]*| [ \t]+')        # → ' '
+NEWLINE_PAD_RE = re.compile(r' +\n *|\n +')           # → '\n'
+HYPHEN_BREAK_RE = re.compile(r'-(?<=[a-z]-)\n(?=[a-z])')
+
+# aB → a B, a1 → a 1, 1a → 1 a in a single scan
+BOUNDARY_RE = re.compile(r'([a-z](?=[A-Z\d])|[A-Z](?=\d)|\d(?=[A-Za-z]))')
+
+DROPCAP_RE = re.compile(r'(^|[\n\.!\?]\s+)([a-z])\s+([a-z]+)')
+
+def remove_artifacts(text):
+    """Strip URLs and page numbers"""
+    for pattern in ARTIFACT_PATTERNS:
+        text = pattern.sub('', text)
+    return text
+
+def normalize_whitespace(text):
+    """
+    Collapse spaces/tabs, trim spaces around newlines and join hyphenated
+    line breaks (associ-\nation → association)
+    """
+    text = SPACE_RUN_RE.sub(' ', text)
+    text = NEWLINE_PAD_RE.sub('\n', text)
 
-    log("="*60)
-    log("[CLEAN] BLOCK 4 — Safe cleaning pipeline")
+    last_join = -1
 
-    text = raw_path.read_text(encoding="utf-8")
-    original_length = len(text)
+    def join(m):
+        nonlocal last_join
+        # a letter that ended the previous join cannot start another
+        # one (a-\nb-\nc → ab-\nc), as with ([a-z])-\n([a-z])
+        if m.start() - 1 == last_join:
+            return "-\n"
+        last_join = m.end()
+        return ""
 
-    # ------------------------------------------------------------------------
-    # CHARACTER NORMALIZE
-    # ------------------------------------------------------------------------
+    return HYPHEN_BREAK_RE.sub(join, text)
 
-    ligatures = {'ﬁ':'fi','ﬂ':'fl','ﬀ':'ff','ﬃ':'ffi','ﬄ':'ffl'}
-    for k,v in ligatures.items():
-        text = text.replace(k, v)
+def protect_boundaries(text):
+    """Split accidental letter/digit/case merges"""
+    return BOUNDARY_RE.sub(r'\1 ', text)
 
-    quotes = {'’':"'",'‘':"'",'“':'"','”':'"','–':'-','—':'-','−':'-'}
-    for k,v in quotes.items():
-        text = text.replace(k, v)
+# Block 4 streams its input in windows of about this many characters, so
+# memory stays proportional to the window rather than the document
+CLEAN_WINDOW_CHARS = int(float(os.environ.get("PIPELINE_CLEAN_WINDOW_MB", "4")) * 1024 * 1024)
 
-    # remove zero-width junk
-    text = re.sub(r'[\u200B-\u200D\uFEFF]', '', text)
+# Hard cap, in windows, on text held back while no safe cut is found
+# (e.g. no newline, or only 1-2 letter words); past it a window is cut at
+# whitespace even if a repair might have crossed the cut
+CLEAN_WINDOW_MAX = 4
 
-    # ------------------------------------------------------------------------
-    # REMOVE SIMPLE ARTIFACTS
-    # ------------------------------------------------------------------------
+# Large documents are cleaned window by window in a process pool
+CLEAN_WORKERS = int(os.environ.get("PIPELINE_CLEAN_WORKERS", "0"))
 
-    text = re.sub(r'http[s]?://\S+', '', text)
-    text = re.sub(r'www\.\S+', '', text)
-    text = re.sub(r'Page \d+', '', text, flags=re.I)
+# Raw text shorter than this is cleaned in-process: shipping windows to
+# workers would cost more than cleaning them here
+PARALLEL_MIN_CHARS = 8 * 1024 * 1024
 
-    # ------------------------------------------------------------------------
-    # SAFE WHITESPACE NORMALIZE
-    # ------------------------------------------------------------------------
+# Smallest window handed to a pool worker
+CLEAN_SHARD_MIN_CHARS = 1024 * 1024
+
+def copy_text(src_path, dst_path, block_chars=None):
+    """Stream a UTF-8 text file into dst_path (undecodable bytes replaced); returns its length in characters"""
+    block_chars = block_chars or CLEAN_WINDOW_CHARS
+    length = 0
+
+    with open(src_path, encoding="utf-8", errors="replace") as src, \
+         open(dst_path, "w", encoding="utf-8") as dst:
+        while block := src.read(block_chars):
+            dst.write(block)
+            length += len(block)
+
+    return length
+
+# Patterns the window cutter scans for seams
+WHITESPACE_RE = re.compile(r'\s')
+TOKEN_RE = re.compile(r'\S+')
+SPACED_TOKEN_RE = re.compile(r'(?<!\S)\S+(?=\s)')
+
+def _last_match(text, pattern, accept=None, start=0):
+    """
+    Last match of pattern in text[start:] that accept(match) approves, or
+    None. Scans tails of doubling length from the end, so a match near the
+    end of a long text is found without a full pass.
+    """
+    probe = 4096
+    pos = len(text)
+
+    while pos > start:
+        pos = max(start, pos - probe)
+        last = None
+        for m in pattern.finditer(text, pos):
+            if accept is None or accept(m):
+                last = m
+        if last is not None:
+            return last
+        probe *= 2
+
+    return None
+
+def _token_seam(text):
+    """
+    Index just past the last token no cleaning pass can touch or look
+    across, 0 if there is none. The token must be followed by whitespace,
+    not be a word of 1-2 letters (which may join the next token or be a
+    drop-cap letter), not end a sentence (never starts a drop-cap match)
+    and not end in a hyphen (never a hyphenated line break). Splits only
+    look at one token, and whitespace and boundary patterns cannot span a
+    non-space character, so nothing matches across the seam.
+    """
+    def safe(m):
+        tok = m.group()
+        return (m.end() < len(text) and tok[-1] not in ".!?-"
+                and not (len(tok) <= 2 and tok.isalpha()))
+
+    m = _last_match(text, TOKEN_RE, safe)
+    return m.end() if m else 0
+
+def _artifact_seam(text):
+    """
+    Index of the last whitespace that no artifact pattern can match
+    across, 0 if there is none: the token before it holds no URL and does
+    not end in "page", so it is left alone by remove_artifacts() and
+    cannot start a match that reaches past it.
+    """
+    def safe(m):
+        tok = m.group()
+        return "://" not in tok and "www." not in tok and not tok.lower().endswith("page")
+
+    m = _last_match(text, SPACED_TOKEN_RE, safe)
+    return m.end() if m else 0
 
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r' *\n *', '\n', text)
+def _forced_seam(text):
+    """Index of the last whitespace after the start (len(text) if none)"""
+    m = _last_match(text, WHITESPACE_RE, start=1)
+    return m.start() if m else len(text)
+
+def iter_clean_windows(src, counters, window_chars=None):
+    """
+    Read raw text from src and yield it character-normalized and stripped
+    of artifacts, in windows of about window_chars that clean_window() can
+    finish independently.
+
+    Artifacts are only removed up to the last newline (or, in text without
+    line breaks, the last space no artifact can span), and windows are
+    only cut at a token seam. Whatever follows (a hyphenated line break, a
+    broken "t he" pair, a drop-cap) is carried into the next round. Every
+    window after the first starts with whitespace.
+
+    Text without such cuts is held back for at most CLEAN_WINDOW_MAX
+    windows; then it is cut at whitespace anyway (counted as
+    counters["forced_cuts"]), so memory stays bounded by the window size.
+    """
+    window_chars = window_chars or CLEAN_WINDOW_CHARS
+    max_chars = CLEAN_WINDOW_MAX * window_chars
+    pending = ""        # normalized characters, artifacts not yet removed
+    stripped = ""       # artifacts removed, not yet yielded
+
+    def forced(kind):
+        if not counters["forced_cuts"]:
+            log(f"[WARN] No safe {kind} in {max_chars:,} chars — cutting at whitespace; "
+                f"repairs across such cuts are skipped")
+        counters["forced_cuts"] += 1
+
+    while True:
+        block = src.read(window_chars)
+        counters["raw_chars"] += len(block)
+        pending += normalize_chars(block)
+
+        cut = pending.rfind("\n") + 1 if block else len(pending)
+        if not cut and len(pending) >= window_chars:
+            cut = _artifact_seam(pending)
+            if not cut and len(pending) >= max_chars:
+                cut = len(pending)
+                forced("line break")
+        if cut:
+            stripped += remove_artifacts(pending[:cut])
+            pending = pending[cut:]
+
+        if not block:
+            if stripped:
+                yield stripped
+            return
+
+        if len(stripped) >= window_chars:
+            seam = _token_seam(stripped)
+            if not seam and len(stripped) >= max_chars:
+                seam = _forced_seam(stripped)
+                forced("window seam")
+            if seam:
+                yield stripped[:seam]
+                stripped = stripped[seam:]
+
+def clean_window(text, dictionary, counters, continued=False):
+    """
+    Block 4 passes over one window from iter_clean_windows(): whitespace
+    and hyphen line-break fix, dictionary join and split, drop-cap fix and
+    boundary protection. Repair counts are added to counters; continued
+    means earlier windows already produced output.
+    """
 
     # ------------------------------------------------------------------------
-    # SAFE HYPHEN LINE-BREAK FIX ONLY
+    # SAFE WHITESPACE NORMALIZE + HYPHEN LINE-BREAK FIX ONLY
     # example: associ-
     #          ation → association
     # ------------------------------------------------------------------------
 
-    text = re.sub(r'([a-z])-\n([a-z])', r'\1\2', text)
-
-    # =====================================================================
-    # LOAD DICTIONARY
-    # =====================================================================
-
-    dict_path = Path(__file__).parent / "dictionaries" / "frequency_dictionary_en_82_765.txt"
-    word_set = set()
-
-    if dict_path.exists():
-        with open(dict_path, encoding="utf-8") as f:
-            for line in f:
-                w = line.strip().split()[0].lower()
-                if w:
-                    word_set.add(w)
-        log(f"[DICT] Loaded words: {len(word_set):,}")
-    else:
-        log("[DICT] Not found — join/split disabled")
+    text = normalize_whitespace(text)
 
     # =====================================================================
     # SAFE SMALL WORD JOIN (t he → the)
     # only if merged form exists in dictionary
     # =====================================================================
 
+    word_set = dictionary.freqs if dictionary else None
     broken_pairs = 0
     joins = 0
 
@@ -380,116 +1149,1150 @@ def run_pipeline(source_file_path):
 
         text = " ".join(fixed)
 
-    log(f"[REPAIR] Broken pairs detected: {broken_pairs}")
-    log(f"[REPAIR] Dictionary joins applied: {joins}")
+    # =====================================================================
+    # SAFE DICTIONARY SPLIT (ina → in a, inthebeginning → in the beginning)
+    # only when EVERY piece is a valid word; most probable split wins
+    # =====================================================================
+
+    split_fixes = 0
+
+    if word_set:
+
+        segment = dictionary.segmenter.segment
+        repairs = dictionary.repairs
+        hits_before, misses_before = repairs.stats()
+        tokens = text.split()
+        fixed = []
+
+        for tok in tokens:
+
+            low = tok.lower()
+
+            if low in word_set or not tok.isalpha() or len(tok) < 4:
+                fixed.append(tok)
+                continue
+
+            pieces = repairs.get(low, segment)
+
+            if pieces:
+                fixed.append(" ".join(pieces))
+                split_fixes += 1
+            else:
+                fixed.append(tok)
+
+        text = " ".join(fixed)
+
+        hits, misses = repairs.stats()
+        counters["cache_hits"] += hits - hits_before
+        counters["cache_misses"] += misses - misses_before
+
+        # tokens were rejoined with single spaces; the window boundary is
+        # one of them
+        if text and continued:
+            text = " " + text
+
+    # =====================================================================
+    # DROP-CAP FIX (n glancing → In glancing, t he → The he)
+    # sentence/line start only — safe
+    # =====================================================================
+
+    dropcap_fixes = 0
+
+    def _dropcap_repl(m):
+        nonlocal dropcap_fixes   # ✅ correct for nested function
+        dropcap_fixes += 1
+
+        prefix = m.group(1)
+        first = m.group(2)
+        word = m.group(3)
+
+        if first == "n":
+            return prefix + "In " + word
+        if first == "t":
+            return prefix + "The " + word
+        if first == "i":
+            return prefix + "I " + word
+
+        return prefix + first.upper() + " " + word
+
+    text = DROPCAP_RE.sub(_dropcap_repl, text)
+
+    # =====================================================================
+    # BOUNDARY PROTECTION (prevent accidental merges)
+    # =====================================================================
+
+    text = protect_boundaries(text)
+
+    counters["broken_pairs"] += broken_pairs
+    counters["joins"] += joins
+    counters["split_fixes"] += split_fixes
+    counters["dropcap_fixes"] += dropcap_fixes
+
+    return text
+
+def _clean_shard(text, continued, use_dictionary):
+    """Pool task: clean one window with this process's copy of the dictionary"""
+    counters = Counter()
+    dictionary = load_dictionary() if use_dictionary else None
+    text = clean_window(text, dictionary, counters, continued)
+    return text, counters
+
+def clean_stream(src, dictionary, counters, workers=1, window_chars=None):
+    """
+    Yield the cleaned text of src piece by piece, in order.
+
+    With workers > 1 windows are cleaned in a process pool, at most two
+    per worker in flight so memory stays bounded. Forked workers inherit the
+    parent's dictionary; spawned ones load the compiled artifact.
+    """
+    windows = iter_clean_windows(src, counters, window_chars)
+    written = False
+
+    if workers <= 1:
+        for window in windows:
+            piece = clean_window(window, dictionary, counters, continued=written)
+            written = written or bool(piece)
+            yield piece
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+
+        def submit(index, window):
+            future = pool.submit(_clean_shard, window, index > 0, dictionary is not None)
+            in_flight.append((index, window, future))
+
+        def collect():
+            index, window, future = in_flight.popleft()
+            piece, shard_counters = future.result()
+
+            # Shards are cleaned assuming earlier output exists; redo the
+            # rare one that turns out to be the first with any text
+            if index > 0 and piece and not written:
+                return clean_window(window, dictionary, counters, continued=False)
+
+            counters.update(shard_counters)
+            return piece
+
+        for index, window in enumerate(windows):
+            submit(index, window)
+            if len(in_flight) >= 2 * workers:
+                piece = collect()
+                written = written or bool(piece)
+                yield piece
+
+        while in_flight:
+            piece = collect()
+            written = written or bool(piece)
+            yield piece
+
+
+# ============================================================================
+# CHUNKING (BLOCKS 5 & 6)
+# ============================================================================
+
+# Chunking parameters (Blocks 5 & 6)
+CHUNK_WORDS = 180
+OVERLAP_WORDS = 30
+MIN_CHUNK_WORDS = 80        # chunks must have more words than this
+MIN_SENTENCE_CHARS = 40
+MAX_SYMBOL_RATIO = 0.25
+
+# Periods after these words (and after single capital initials, "J. R.
+# Tolkien") do not end a sentence in the rules segmenter
+SENTENCE_ABBREVIATIONS = (
+    "Mr", "Mrs", "Ms", "Dr", "Prof", "Sr", "Jr", "St", "Mt", "Rev", "Hon",
+    "Gen", "Col", "Capt", "Lt", "Sgt", "Gov", "Sen", "Rep", "Inc", "Ltd",
+    "Co", "Corp", "Bros", "vs", "cf", "al", "ca", "approx", "e.g", "i.e",
+    "E.g", "I.e", "Fig", "Figs", "fig", "figs", "Vol", "vol", "Ch", "ch",
+    "No", "Nos", "pp", "Eq", "Eqs", "Jan", "Feb", "Mar", "Apr", "Jun",
+    "Jul", "Aug", "Sep", "Sept", "Oct", "Nov", "Dec",
+)
+
+def _sentence_rules_re(abbreviations):
+    """
+    Match . ! ? plus the whitespace after it, except when the period ends
+    an abbreviation or an initial; a sentence ends after the match's first
+    character. Starting with the punctuation class (not a lookbehind) lets
+    the scanner skip ahead. Lookbehinds must be fixed-width, so
+    abbreviations are grouped into one negative lookbehind per length.
+    """
+    by_length = {}
+    for word in abbreviations:
+        by_length.setdefault(len(word), []).append(re.escape(word))
+    guards = "".join(
+        rf"(?<!\b(?:{'|'.join(words)})\.)" for _, words in sorted(by_length.items()))
+    return re.compile(rf"[.!?](?<!\b[A-Z]\.){guards}\s+")
+
+SENTENCE_RULES_RE = _sentence_rules_re(SENTENCE_ABBREVIATIONS)
+SENTENCE_CONTEXT = max(map(len, SENTENCE_ABBREVIATIONS)) + 2   # word + "." + \b
+
+# Punkt rescans the open sentence with every piece; past this length it
+# is emitted (cut at whitespace) so text without boundaries stays linear
+SENTENCE_OPEN_MAX_CHARS = 64 * 1024
+
+# Symbols are characters neither alphanumeric nor whitespace; for str
+# patterns \w is exactly isalnum() plus "_" and \s exactly isspace()
+SYMBOL_RE = re.compile(r'[^\w\s]|_')
+ASCII_WORD_SPACE = bytes(i for i in range(128) if chr(i).isalnum() or chr(i).isspace())
+
+def symbol_count(s):
+    """
+    Number of characters in s that are neither alphanumeric nor whitespace.
+
+    ASCII letters, digits and whitespace are deleted from the UTF-8 bytes
+    in one C-level translate; whatever remains is ASCII symbols plus whole
+    non-ASCII characters, and only those few are classified by regex.
+    """
+    rest = s.encode("utf-8", "surrogatepass").translate(None, ASCII_WORD_SPACE)
+    if rest.isascii():
+        return len(rest)
+    return len(SYMBOL_RE.findall(rest.decode("utf-8", "surrogatepass")))
+
+@lru_cache(maxsize=None)
+def load_punkt(language="english"):
+    """
+    NLTK's pretrained Punkt sentence model, loaded once per process and
+    shared by every job; None if nltk or its punkt data is missing.
+    """
+    if not has_module("nltk"):
+        return None
+    try:
+        try:
+            from nltk.tokenize.punkt import PunktTokenizer     # nltk >= 3.8.2, punkt_tab data
+            return PunktTokenizer(language)
+        except ImportError:
+            import nltk.data
+            return nltk.data.load(f"tokenizers/punkt/{language}.pickle")
+    except (LookupError, OSError, ValueError):
+        return None
+
+class SentenceSegmenter:
+    """
+    Incremental sentence splitting with a pluggable backend.
+
+    "rules" (default): one compiled regex, SENTENCE_RULES_RE; splits after
+    . ! ? and whitespace unless the period ends a known abbreviation or an
+    initial. "punkt": NLTK's unsupervised Punkt model (optional). Time spent
+    splitting is accumulated for throughput stats.
+    """
+
+    BACKENDS = ("rules", "punkt")
+
+    def __init__(self, backend="rules"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"unknown sentence backend: {backend}")
+        self.backend = backend
+        self.punkt = None
+        if backend == "punkt":
+            self.punkt = load_punkt()
+            if self.punkt is None:
+                raise LookupError("NLTK punkt model not available")
+        self.sentences = 0
+        self.chars = 0
+        self.seconds = 0.0
+
+    def split(self, text):
+        return list(self.iter_sentences([text]))
+
+    def iter_sentences(self, text_iter):
+        """
+        Split a stream of text pieces into sentences as they complete.
+
+        Sentences match splitting the joined text at once, up to leading
+        whitespace when a whitespace run is cut by a piece boundary.
+        """
+        split_piece = self._split_punkt if self.punkt else self._split_rules
+        state = {"carry": [], "last": ""}
+
+        for piece in text_iter:
+            if not piece:
+                continue
+            t0 = time.perf_counter()
+            done = split_piece(piece, state)
+            self.seconds += time.perf_counter() - t0
+            self.chars += len(piece)
+            self.sentences += len(done)
+            yield from done
+
+        if state["carry"]:
+            self.sentences += 1
+            yield "".join(state["carry"])
+
+    def _split_rules(self, piece, state):
+        """
+        Only the open sentence's last SENTENCE_CONTEXT characters are
+        kept as lookbehind context, so an unterminated sentence never makes
+        the work quadratic.
+        """
+        carry, last = state["carry"], state["last"]
+        scan = last + piece
+        start = len(last)
+        done = []
+
+        # The punctuation of a boundary may be the last character already seen
+        for m in SENTENCE_RULES_RE.finditer(scan, max(start - 1, 0)):
+            carry.append(scan[start:m.start() + 1])
+            done.append("".join(carry))
+            carry.clear()
+            start = m.end()
+
+        carry.append(scan[start:])
+        state["last"] = scan[max(start if done else 0, len(scan) - SENTENCE_CONTEXT):]
+        return done
+
+    def _split_punkt(self, piece, state):
+        """
+        The last sentence stays open: the next piece may continue it. An
+        open sentence longer than SENTENCE_OPEN_MAX_CHARS is emitted up to
+        its last whitespace instead, so it is not rescanned forever.
+        """
+        text = "".join(state["carry"]) + piece
+        spans = list(self.punkt.span_tokenize(text))
+        start = spans[-1][0] if spans else 0
+        done = [text[a:b] for a, b in spans[:-1]]
+
+        if len(text) - start > SENTENCE_OPEN_MAX_CHARS:
+            m = _last_match(text, WHITESPACE_RE, start=start + 1)
+            cut = m.start() if m else len(text)
+            done.append(text[start:cut])
+            start = cut
+
+        state["carry"] = [text[start:]]
+        return done
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "sentences": self.sentences,
+            "chars": self.chars,
+            "seconds": round(self.seconds, 3),
+            "chars_per_sec": round(self.chars / self.seconds) if self.seconds else 0,
+        }
+
+def iter_good_sentences(sentences, counters=None, min_chars=MIN_SENTENCE_CHARS,
+                        max_symbol_ratio=MAX_SYMBOL_RATIO):
+    """Strip sentences and drop short or symbol-heavy (OCR garbage) ones"""
+    kept = 0
+    for s in sentences:
+        s = s.strip()
+        
+        if len(s) < min_chars:
+            continue
+        
+        # Drop OCR garbage heavy symbol ratio
+        sym_ratio = symbol_count(s) / max(len(s), 1)
+        if sym_ratio > max_symbol_ratio:
+            continue
+        
+        kept += 1
+        yield s
+
+    if counters is not None:
+        counters["kept_sentences"] += kept
+
+def _iter_chunk_parts(sentences, chunk_size, overlap_words, min_size, word_tokens=None):
+    """
+    Yield (chunk, shared, size) as chunks close: the chunk text, how many
+    of its leading characters repeat the end of the previous chunk
+    (overlap), and its size.
+
+    Sizes are word counts, or token counts when word_tokens (word -> its
+    token count) is given; chunk_size and min_size are in that unit
+    either way. Overlap is always in words.
+    """
+    current = []        # words of the open chunk
+    costs = []          # their token counts (token budgets only)
+    size = 0
+    first = 0           # stream index of current[0]
+    prev_end = 0        # stream index just past the previous chunk
+
+    def close():
+        nonlocal prev_end
+        k = prev_end - first
+        shared = len(" ".join(current[:k])) if k > 0 else 0
+        prev_end = first + len(current)
+        return " ".join(current), shared, size
+
+    for sent in sentences:
+        w = sent.split()
+        if word_tokens is None:
+            cost = len(w)
+        else:
+            wc = [word_tokens(word) for word in w]
+            cost = sum(wc)
+        
+        if size + cost <= chunk_size:
+            current.extend(w)
+            if word_tokens is not None:
+                costs.extend(wc)
+        else:
+            if size > min_size:
+                yield close()
+            
+            # Overlap tail
+            tail = current[-overlap_words:] if overlap_words else []
+            first += len(current) - len(tail)
+            current = tail + w
+            if word_tokens is None:
+                cost += len(tail)
+            else:
+                costs = (costs[-len(tail):] if tail else []) + wc
+                cost = sum(costs)
+            size = 0
+        size += cost
+    
+    # Last chunk
+    if size > min_size:
+        yield close()
+
+def iter_chunks(text_iter, chunk_words=CHUNK_WORDS, overlap_words=OVERLAP_WORDS,
+                min_words=MIN_CHUNK_WORDS, counters=None,
+                min_sentence_chars=MIN_SENTENCE_CHARS, max_symbol_ratio=MAX_SYMBOL_RATIO,
+                segmenter=None, word_tokens=None):
+    """
+    Chunk a stream of cleaned text lazily, yielding each chunk as it closes.
+
+    text_iter yields text pieces of any size (e.g. file blocks). Sentences
+    are split and filtered as they arrive and packed into word-bounded
+    chunks with an overlapping tail; chunks must have more than min_words
+    words. Memory stays bounded by one piece plus one open chunk. Sentence
+    counts are added to counters when given; segmenter defaults to a rules
+    SentenceSegmenter. With word_tokens (e.g. a TokenCounter) chunk_words
+    and min_words are token counts instead.
+    """
+    segmenter = segmenter or SentenceSegmenter()
+    sentences = iter_good_sentences(segmenter.iter_sentences(text_iter), counters,
+                                    min_sentence_chars, max_symbol_ratio)
+    for chunk, _, _ in _iter_chunk_parts(sentences, chunk_words, overlap_words, min_words,
+                                         word_tokens):
+        yield chunk
+
+class ChunkSpans(Sequence):
+    """
+    Chunks as (start, end) offsets into one shared text buffer.
+
+    Overlapping chunks reuse the same characters, and each chunk string is
+    only sliced out when it is accessed, so holding every chunk costs about
+    one copy of the kept text.
+    """
+
+    def __init__(self):
+        self._pieces = []
+        self._length = 0
+        self._text = None
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def append(self, chunk, shared=0):
+        """Add a chunk whose first `shared` characters end the buffer already"""
+        start = self._length - shared
+        self._pieces.append(chunk[shared:])
+        self._length += len(chunk) - shared
+        self._text = None
+        self.starts.append(start)
+        self.ends.append(self._length)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self._pieces)
+            self._pieces = [self._text]
+        return self._text
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.text[self.starts[index]:self.ends[index]]
+
+# ----------------------------------------------------------------------------
+# Tokenizers (token-budget chunking)
+# ----------------------------------------------------------------------------
+
+class WhitespaceTokenizer:
+    """One token per whitespace-separated word (token budgets = word budgets)"""
+
+    name = "whitespace"
+    digest = "whitespace"
+
+    def encode(self, text):
+        return text.split()
+
+    def count(self, text):
+        return len(text.split())
+
+@lru_cache(maxsize=1)
+def _bytes_to_unicode():
+    """GPT-2's reversible byte -> printable unicode character map"""
+    bs = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) \
+        + list(range(ord("®"), ord("ÿ") + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, map(chr, cs)))
+
+class BPETokenizer:
+    """
+    Byte-level BPE in pure Python, loaded from a directory holding a
+    GPT-2 style vocab.json and merges.txt. Pre-tokenization follows GPT-2,
+    with re classes standing in for \\p{L} and \\p{N}.
+    """
+
+    PRETOKEN_RE = re.compile(
+        r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+""")
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        vocab_bytes = (directory / "vocab.json").read_bytes()
+        merges_bytes = (directory / "merges.txt").read_bytes()
+
+        self.name = f"bpe:{directory.name}"
+        self.digest = hashlib.blake2b(vocab_bytes + b"\0" + merges_bytes, digest_size=16).hexdigest()
+        self.encoder = json.loads(vocab_bytes.decode("utf-8"))
+        merges = [tuple(line.split()) for line in merges_bytes.decode("utf-8").splitlines()
+                  if line.strip() and not line.startswith("#version")]
+        self.ranks = {pair: i for i, pair in enumerate(merges)}
+        self.byte_encoder = _bytes_to_unicode()
+        self._cache = {}
+
+    def bpe(self, token):
+        """Merge the symbols of one pre-token by rank; returns the pieces"""
+        pieces = self._cache.get(token)
+        if pieces is not None:
+            return pieces
+
+        word = list(token)
+        while len(word) > 1:
+            pair = min(zip(word, word[1:]), key=lambda p: self.ranks.get(p, math.inf))
+            if pair not in self.ranks:
+                break
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and (word[i], word[i + 1]) == pair:
+                    merged.append(word[i] + word[i + 1])
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = merged
+
+        pieces = self._cache[token] = tuple(word)
+        return pieces
+
+    def tokenize(self, text):
+        out = []
+        for pre in self.PRETOKEN_RE.findall(text):
+            out.extend(self.bpe("".join(self.byte_encoder[b] for b in pre.encode("utf-8"))))
+        return out
+
+    def encode(self, text):
+        return [self.encoder[piece] for piece in self.tokenize(text)]
+
+    def count(self, text):
+        return len(self.tokenize(text))
+
+@lru_cache(maxsize=None)
+def load_tokenizer(spec="whitespace"):
+    """
+    Tokenizer for token budgets, loaded once per process: "whitespace",
+    or a directory with vocab.json and merges.txt (absolute, relative to
+    the working directory, or relative to this script).
+    """
+    if spec == "whitespace":
+        return WhitespaceTokenizer()
+
+    path = Path(spec).expanduser()
+    if not path.is_absolute() and not path.exists():
+        path = Path(__file__).parent / path
+    if not (path / "vocab.json").is_file() or not (path / "merges.txt").is_file():
+        raise ValueError(f"tokenizer not found: {spec} (needs vocab.json and merges.txt)")
+    return BPETokenizer(path)
+
+class TokenCounter:
+    """
+    word -> token count, cached and optionally persisted as JSON.
+
+    A word is counted as it appears after a space inside a chunk, so a
+    chunk's size is the sum over its words (its first word may differ by
+    a token). Counts depend only on the word and the tokenizer, so any
+    re-chunking (new budgets, new cleaning) reuses them.
+    """
+
+    def __init__(self, tokenizer, path=None):
+        self.tokenizer = tokenizer
+        self.path = path
+        self.counts = {}
+        self.loaded = 0
+        if path is not None and path.exists():
+            try:
+                self.counts = json.loads(path.read_text(encoding="utf-8"))
+                self.loaded = len(self.counts)
+            except ValueError:
+                self.counts = {}
+
+    def __call__(self, word):
+        n = self.counts.get(word)
+        if n is None:
+            n = self.counts[word] = self.tokenizer.count(" " + word)
+        return n
+
+    def save(self):
+        """Write the cache atomically if new words were counted"""
+        if self.path is None or len(self.counts) == self.loaded:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.counts, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self.loaded = len(self.counts)
+
+
+# ============================================================================
+# DEDUPLICATION (BLOCK 7)
+# ============================================================================
+
+DEDUP_THRESHOLD = 0.85    # estimated Jaccard similarity that counts as a duplicate
+SHINGLE_WORDS = 5         # words per shingle
+MINHASH_PERM = 128        # signature length
+MINHASH_BANDS = 16        # LSH bands (MINHASH_PERM / bands rows each)
+MINHASH_MASK = (1 << 64) - 1
+MINHASH_BATCH_SHINGLES = 1 << 15
+
+def shingle_hashes(text, shingle_words=SHINGLE_WORDS):
+    """crc32 of every lowercased shingle_words-word window (whole text if shorter)"""
+    words = text.lower().split()
+    span = min(shingle_words, len(words)) or 1
+    return {zlib.crc32(" ".join(words[i:i + span]).encode("utf-8"))
+            for i in range(max(len(words) - span + 1, 1))}
+
+class MinHasher:
+    """
+    MinHash signatures from multiply-shift hashes ((a*x + b) mod 2**64) >> 32
+    of 32-bit shingle hashes, with seeded coefficients. Batches run in
+    NumPy when it is installed; the pure Python path gives identical
+    signatures.
+    """
+
+    def __init__(self, num_perm=MINHASH_PERM, seed=42):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.getrandbits(64) | 1 for _ in range(num_perm)]
+        self.b = [rng.getrandbits(64) for _ in range(num_perm)]
+        self._np = None
+        if has_module("numpy"):
+            import numpy as np
+            self._np = np
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes):
+        """array('I') signature of one shingle hash set"""
+        return self.signatures([hashes])[0]
+
+    def signatures(self, hash_sets):
+        """Signatures for a batch of shingle hash sets, in order"""
+        hash_sets = [sorted(h) or [0] for h in hash_sets]
+        if self._np is None:
+            return [array("I", (min(((a * x + b) & MINHASH_MASK) >> 32 for x in xs)
+                                for a, b in zip(self.a, self.b)))
+                    for xs in hash_sets]
+        np = self._np
+        xs = np.fromiter((x for h in hash_sets for x in h), dtype=np.uint64)
+        starts = np.cumsum([0] + [len(h) for h in hash_sets[:-1]])
+        # uint64 arithmetic wraps, i.e. is already mod 2**64
+        values = self._a * xs
+        values += self._b
+        values >>= np.uint64(32)
+        mins = np.minimum.reduceat(values, starts, axis=1).T.astype(np.uint32)
+        return [array("I", row.tobytes()) for row in mins]
+
+def find_duplicates(chunks, threshold=DEDUP_THRESHOLD, shingle_words=SHINGLE_WORDS,
+                    num_perm=MINHASH_PERM, bands=MINHASH_BANDS):
+    """
+    Find chunks that repeat an earlier kept chunk.
+
+    Exact copies are found by content hash. With threshold below 1, MinHash
+    signatures are bucketed by LSH band, so only chunks sharing a band are
+    compared (near-linear, not all pairs); a candidate counts when the
+    share of equal signature slots is at least threshold. Returns
+    (id, duplicate_of, kind, similarity) tuples in id order; the first
+    chunk of each group is kept.
+    """
+    removed = []
+    exact = {}
+    near = threshold < 1
+    hasher = MinHasher(num_perm) if near else None
+    rows = num_perm // bands
+    buckets = [{} for _ in range(bands)]
+    kept_signatures = {}
+
+    def match_near(batch):
+        ids = [i for i, _ in batch]
+        for i, sig in zip(ids, hasher.signatures([hashes for _, hashes in batch])):
+            keys = [sig[b * rows:(b + 1) * rows].tobytes() for b in range(bands)]
+            best, best_sim = None, 0.0
+            for j in sorted({buckets[b][k] for b, k in enumerate(keys) if k in buckets[b]}):
+                sim = sum(1 for x, y in zip(sig, kept_signatures[j]) if x == y) / num_perm
+                if sim > best_sim:
+                    best, best_sim = j, sim
+            if best is not None and best_sim >= threshold:
+                removed.append((i, best, "near", round(best_sim, 4)))
+                continue
+            kept_signatures[i] = sig
+            for b, k in enumerate(keys):
+                buckets[b].setdefault(k, i)
+
+    batch, batch_shingles = [], 0
+    for i, chunk in enumerate(chunks):
+        digest = hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).digest()
+        first = exact.setdefault(digest, i)
+        if first != i:
+            removed.append((i, first, "exact", 1.0))
+        elif near:
+            hashes = shingle_hashes(chunk, shingle_words)
+            batch.append((i, hashes))
+            batch_shingles += len(hashes)
+            if batch_shingles >= MINHASH_BATCH_SHINGLES:
+                match_near(batch)
+                batch, batch_shingles = [], 0
+    if batch:
+        match_near(batch)
+
+    removed.sort()
+    return removed
+
+class ChunkSubset(Sequence):
+    """The chunks left after deduplication; ids[k] is the chunk id of item k"""
+
+    def __init__(self, chunks, removed_ids=()):
+        removed = set(removed_ids)
+        self.chunks = chunks
+        self.ids = array("q", (i for i in range(len(chunks)) if i not in removed))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.chunks[self.ids[index]]
+
+
+# ============================================================================
+# STAGE TRACKING (INCREMENTAL EXECUTION & RESUME)
+# ============================================================================
+
+# Record files written by the export stage (Block 8), besides corpus.txt,
+# as pretty JSON arrays (.json) or JSON Lines (.jsonl)
+EXPORT_RECORD_FILES = ["chunks_with_id", "lora_instruct", "pairs", "train", "val", "test"]
+EXPORT_WRITERS = {"json": save_json_array, "jsonl": save_jsonl}
+EXPORT_FORMAT = os.environ.get("PIPELINE_EXPORT_FORMAT", "json")
+
+def export_files(export_format=EXPORT_FORMAT):
+    return ["corpus.txt"] + [f"{name}.{export_format}" for name in EXPORT_RECORD_FILES]
+
+# Bump a stage's version whenever its logic changes output, so cached
+# results from older code are not reused
+STAGE_VERSIONS = {
+    "extract": 2,
+    "clean": 5,
+    "chunk": 4,
+    "dedup": 1,
+    "export": 4,
+    "report": 4,
+}
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    Tunable parameters of a run (chunking, Blocks 5 & 6; deduplication,
+    Block 7; export format, Block 8). Each feeds the fingerprint of its stage, so changing one
+    reruns that stage and the ones after it while earlier results are reused.
+    """
+
+    chunk_words: int = CHUNK_WORDS
+    overlap_words: int = OVERLAP_WORDS
+    min_chunk_words: int = MIN_CHUNK_WORDS      # chunks must be larger than this (tokens under chunk_tokens)
+    min_sentence_chars: int = MIN_SENTENCE_CHARS
+    max_symbol_ratio: float = MAX_SYMBOL_RATIO
+    sentence_backend: str = "rules"             # SentenceSegmenter.BACKENDS
+    chunk_tokens: int = 0                       # token budget; 0 = chunk_words budget
+    tokenizer: str = "whitespace"               # or a vocab.json + merges.txt directory
+    dedup_threshold: float = field(default=DEDUP_THRESHOLD, metadata={"stage": "dedup"})  # 0 = off, 1 = exact only
+    shingle_words: int = field(default=SHINGLE_WORDS, metadata={"stage": "dedup"})
+    minhash_perm: int = field(default=MINHASH_PERM, metadata={"stage": "dedup"})
+    minhash_bands: int = field(default=MINHASH_BANDS, metadata={"stage": "dedup"})
+    export_format: str = field(default=EXPORT_FORMAT, metadata={"stage": "export"})  # json or jsonl
+
+    def __post_init__(self):
+        if self.chunk_words < 1:
+            raise ValueError("chunk_words must be at least 1")
+        if not 0 <= self.overlap_words < self.chunk_words:
+            raise ValueError("overlap_words must be between 0 and chunk_words - 1")
+        if self.min_chunk_words < 0 or self.min_sentence_chars < 0 or self.chunk_tokens < 0:
+            raise ValueError("minimum sizes must not be negative")
+        if self.min_chunk_words >= (self.chunk_tokens or self.chunk_words):
+            raise ValueError("min_chunk_words must be below the chunk budget "
+                             "(chunk_tokens, else chunk_words), or no chunk can be kept")
+        if not 0 <= self.max_symbol_ratio <= 1:
+            raise ValueError("max_symbol_ratio must be between 0 and 1")
+        if self.sentence_backend not in SentenceSegmenter.BACKENDS:
+            raise ValueError(f"sentence_backend must be one of {', '.join(SentenceSegmenter.BACKENDS)}")
+        if not 0 <= self.dedup_threshold <= 1:
+            raise ValueError("dedup_threshold must be between 0 and 1")
+        if min(self.shingle_words, self.minhash_perm, self.minhash_bands) < 1:
+            raise ValueError("shingle_words, minhash_perm and minhash_bands must be positive")
+        if self.minhash_perm % self.minhash_bands:
+            raise ValueError("minhash_perm must be a multiple of minhash_bands")
+        if self.export_format not in EXPORT_WRITERS:
+            raise ValueError(f"export_format must be one of {', '.join(EXPORT_WRITERS)}")
+
+    @classmethod
+    def from_dict(cls, options):
+        """Build from plain JSON/CLI values; unknown keys are an error"""
+        types = {f.name: f.type for f in fields(cls)}
+        unknown = sorted(set(options or {}) - set(types))
+        if unknown:
+            raise ValueError(f"unknown config option(s): {', '.join(unknown)}")
+        return cls(**{k: types[k](v) for k, v in (options or {}).items()})
+
+    def to_dict(self, stage="chunk"):
+        """Parameters of one stage's fingerprint"""
+        return {f.name: getattr(self, f.name) for f in fields(self)
+                if f.metadata.get("stage", "chunk") == stage}
+
+class PipelineContext:
+    """Paths and options shared by the stage functions of one run"""
+
+    def __init__(self, source_path, source_hash, work_dir, extract_cache_dir, **options):
+        self.config = PipelineConfig()
+        self.source_path = source_path
+        self.source_hash = source_hash
+        self.work_dir = work_dir
+        self.cache_dir = work_dir / "cache"
+        self.dataset_dir = work_dir / "datasets"
+        self.output_dir = work_dir / "outputs"
+        self.state_file = self.cache_dir / "pipeline_state.json"
+        self.extract_cache_dir = extract_cache_dir
+        self.chunks = None      # ChunkSpans, once chunked in this run
+        self.__dict__.update(options)
+
+class StageTracker:
+    """
+    Stage DAG bookkeeping on top of pipeline_state.json.
+
+    A stage's fingerprint hashes its name, version and parameters together
+    with the fingerprints of the stages it depends on. A stage whose
+    fingerprint matches the last completed run, and whose outputs still
+    exist, is skipped; everything downstream of a changed stage reruns.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+
+    def load(self):
+        """The saved state; a missing or unreadable file reads as a fresh run"""
+        try:
+            state = json.loads(self.state_file.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log(f"[WARN] Unreadable {self.state_file.name} ({e}) — starting fresh")
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def save(self, state):
+        """Write the state atomically, so a crash never leaves it half-written"""
+        tmp = self.state_file.with_name(f"{self.state_file.name}.tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, self.state_file)
+
+    def fingerprint(self, name, deps, params):
+        payload = json.dumps({
+            "stage": name,
+            "version": STAGE_VERSIONS[name],
+            "deps": deps,
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def run(self, name, deps, params, outputs, fn, legacy_stage):
+        """
+        Run fn() unless the stage is up to date. fn returns a dict of extra
+        state fields, or None on failure. Returns the stage fingerprint, or
+        None if the stage failed.
+        """
+        fp = self.fingerprint(name, deps, params)
+        state = self.load()
+        stages = state.setdefault("stages", {})
+
+        if stages.get(name) == fp and all(p.exists() for p in outputs):
+            log(f"[SKIP] Stage '{name}' up to date ({fp[:12]}) — reusing outputs")
+            return fp
+
+        # Forget the old fingerprint first: an interrupted stage must rerun
+        stages.pop(name, None)
+        self.save(state)
+
+        result = fn()
+        if result is None:
+            return None
+
+        state = self.load()
+        state.setdefault("stages", {})[name] = fp
+        state["stage"] = legacy_stage
+        state.update(result)
+        self.save(state)
+        return fp
+
+# ============================================================================
+# PIPELINE STAGES
+# ============================================================================
+
+def stage_extract(ctx):
+    """Block 3 — extract raw text from the source file into raw_text.txt"""
+
+    # ========================================================================
+    # BLOCK 3: PDF TEXT EXTRACTION (DIGITAL → PADDLE OCR FALLBACK) — FIXED
+    # ========================================================================
+
+    log("="*60)
+    log("[EXTRACT] BLOCK 3 — Extracting text from file")
+
+    pdf_path = ctx.source_path
+    DATASET_DIR = ctx.dataset_dir
+    paddle_ok = ctx.paddle_ok
+    extract_params = ctx.extract_params
+
+    method_used = "unknown"
+
+    is_pdf = extract_params["type"] == "pdf"
+
+    # PyMuPDF is only needed (and only imported) for PDF sources
+    if is_pdf and not has_module("fitz"):
+        log("[ERROR] PyMuPDF (fitz) not installed")
+        return None
+    raw_path = DATASET_DIR / "raw_text.txt"
+
+    # Plain text costs nothing to re-read, so only PDF extractions are cached
+    cached = extract_cache_get(ctx.extract_cache_dir, ctx.source_hash, extract_params) if is_pdf else None
+
+    if cached is not None:
+        final_text, cache_meta = cached
+        method_used = cache_meta["method"]
+        page_stats = cache_meta.get("page_methods", {})
+        ocr_metrics = {}
+        log(f"[CACHE] Extraction cache hit — skipping {method_used} extraction")
+
+    elif is_pdf:
+        log("[INFO] Processing PDF file...")
+
+        page_texts = extract_digital_pages(pdf_path, ctx.extract_workers)
+        digital_chars = sum(len(t) for t in page_texts)
 
-    # =====================================================================
-    # SAFE DICTIONARY SPLIT (ina → in a, ashe → as he)
-    # only when BOTH halves are valid words
-    # =====================================================================
+        log(f"[INFO] Digital text length: {digital_chars} characters")
 
-    split_fixes = 0
+        # Per-page decision: only pages with a weak digital layer go to OCR
+        weak_pages = [
+            i for i, t in enumerate(page_texts)
+            if page_text_score(t) < PAGE_DIGITAL_MIN_CHARS
+        ]
+        page_methods = ["digital"] * len(page_texts)
+        ocr_metrics = {}
 
-    if word_set:
+        log(f"[INFO] Pages: {len(page_texts)} total, {len(weak_pages)} weak digital")
 
-        tokens = text.split()
-        fixed = []
+        if weak_pages and paddle_ok:
+            log(f"[INFO] Running PaddleOCR on {len(weak_pages)} weak page(s)")
+            try:
+                ocr_texts, ocr_metrics = ocr_pages(pdf_path, weak_pages, extract_params["ocr_dpi"])
+            except Exception as e:
+                log(f"[WARN] OCR failed: {e}, using digital text")
+                ocr_texts = {}
+
+            # A page OCR read as blank (e.g. an empty page) is not a failure;
+            # either way the digital text is kept
+            for i in weak_pages:
+                if i not in ocr_texts:
+                    page_methods[i] = "ocr_failed"
+                elif ocr_texts[i].strip():
+                    page_texts[i] = ocr_texts[i]
+                    page_methods[i] = "ocr"
+                else:
+                    page_methods[i] = "ocr_empty"
+
+        elif weak_pages:
+            log("[WARN] PaddleOCR unavailable — keeping weak digital pages")
+            for i in weak_pages:
+                page_methods[i] = "digital_weak"
+
+        final_text = "\n\n".join(page_texts).strip()
+
+        ocr_count = page_methods.count("ocr")
+        if ocr_count == 0:
+            method_used = "digital_fallback" if "ocr_failed" in page_methods else "digital_block"
+        elif ocr_count + page_methods.count("ocr_empty") == len(page_methods):
+            method_used = "paddle_ocr"
+        else:
+            method_used = "mixed_digital_ocr"
 
-        for tok in tokens:
+        page_stats = dict(Counter(page_methods))
+        log(f"[INFO] Page methods: {page_stats}")
 
-            low = tok.lower()
+    else:
+        log("[INFO] Reading text file...")
+        try:
+            # streamed, never held in memory whole
+            text_length = copy_text(pdf_path, raw_path)
+            method_used = "text_file"
+            page_stats = {}
+            ocr_metrics = {}
+        except Exception as e:
+            log(f"[ERROR] File Read Error: {e}")
+            return None
 
-            if low in word_set or not tok.isalpha() or len(tok) < 4:
-                fixed.append(tok)
-                continue
 
-            repaired = False
+    if method_used != "text_file":
+        if cached is None:
+            extract_cache_put(ctx.extract_cache_dir, ctx.source_hash, final_text, {
+                "source": pdf_path.name,
+                "method": method_used,
+                "page_methods": page_stats,
+                "params": extract_params,
+            })
 
-            for cut in range(1, len(tok)):
-                left = low[:cut]
-                right = low[cut:]
+        raw_path.write_text(final_text, encoding="utf-8")
+        text_length = len(final_text)
 
-                if left in word_set and right in word_set:
-                    fixed.append(left + " " + right)
-                    split_fixes += 1
-                    repaired = True
-                    break
+    log(f"[INFO] Saved: {raw_path.name}")
+    log(f"[INFO] Method: {method_used}")
+    log(f"[INFO] Final text length: {text_length} characters")
 
-            if not repaired:
-                fixed.append(tok)
+    log("[OK] BLOCK 3 COMPLETE — TEXT READY")
 
-        text = " ".join(fixed)
+    return {
+        "method": method_used,
+        "page_methods": page_stats,
+        "ocr_metrics": ocr_metrics,
+    }
 
-    log(f"[REPAIR] Dictionary splits applied: {split_fixes}")
 
-    # =====================================================================
-    # DROP-CAP FIX (n glancing → In glancing, t he → The he)
-    # sentence/line start only — safe
-    # =====================================================================
+def stage_clean(ctx):
+    """Block 4 — clean raw_text.txt into clean_text.txt"""
 
-    log("[REPAIR] Drop-cap repair pass...")
+    # ========================================================================
+    # BLOCK 4: SAFE CLEAN + DICTIONARY JOIN + SPLIT + DROPCAP + METRICS
+    # ========================================================================
 
-    dropcap_fixes = 0
+    log("="*60)
+    log("[CLEAN] BLOCK 4 — Safe cleaning pipeline")
 
-    pattern = re.compile(r'(^|[\n\.!\?]\s+)([a-z])\s+([a-z]+)')
+    DATASET_DIR = ctx.dataset_dir
+    raw_path = DATASET_DIR / "raw_text.txt"
+    clean_path = DATASET_DIR / "clean_text.txt"
 
-    def _dropcap_repl(m):
-        nonlocal dropcap_fixes   # ✅ correct for nested function
-        dropcap_fixes += 1
+    # =====================================================================
+    # LOAD DICTIONARY
+    # =====================================================================
 
-        prefix = m.group(1)
-        first = m.group(2)
-        word = m.group(3)
+    dictionary = load_dictionary()
 
-        if first == "n":
-            return prefix + "In " + word
-        if first == "t":
-            return prefix + "The " + word
-        if first == "i":
-            return prefix + "I " + word
+    if dictionary:
+        log(f"[DICT] Loaded words: {len(dictionary):,}")
+    else:
+        log("[DICT] Not found — join/split disabled")
 
-        return prefix + first.upper() + " " + word
+    # =====================================================================
+    # STREAMED CLEAN, WINDOW BY WINDOW
+    # character normalize → artifacts → whitespace + hyphen line-break
+    # fix → join → split → drop-cap → boundary protection
+    # =====================================================================
 
-    text = pattern.sub(_dropcap_repl, text)
+    # Large inputs are sharded over a process pool (same output)
+    raw_size = raw_path.stat().st_size
+    workers = CLEAN_WORKERS or os.cpu_count() or 1
+    window_chars = CLEAN_WINDOW_CHARS
 
-    log(f"[REPAIR] Drop-cap fixes applied: {dropcap_fixes}")
+    if workers > 1 and raw_size >= PARALLEL_MIN_CHARS:
+        if dictionary:
+            dictionary.segmenter    # build before forking so workers inherit it
+        window_chars = max(CLEAN_SHARD_MIN_CHARS,
+                           min(window_chars, raw_size // (workers * 4)))
+    else:
+        workers = 1
 
+    counters = Counter()
+    windows = 0
+    cleaned_length = 0
 
+    def write_all(workers):
+        nonlocal windows, cleaned_length
+        with open(raw_path, encoding="utf-8") as src, \
+             open(clean_path, "w", encoding="utf-8") as out:
+            for piece in clean_stream(src, dictionary, counters, workers, window_chars):
+                out.write(piece)
+                cleaned_length += len(piece)
+                windows += 1
+
+    try:
+        write_all(workers)
+    except Exception as e:
+        if workers == 1:
+            raise
+        log(f"[WARN] Parallel cleaning failed ({e}), using serial path")
+        counters.clear()
+        windows = cleaned_length = 0
+        workers = 1
+        write_all(workers)
+
+    log(f"[CLEAN] {windows} window(s) of up to {window_chars:,} chars, {workers} worker(s)")
 
     # =====================================================================
     # METRICS
     # =====================================================================
 
-    if broken_pairs:
-        log(f"[REPAIR] Join confidence: {joins/broken_pairs:.2%}")
+    broken_pairs = counters["broken_pairs"]
+    joins = counters["joins"]
+    split_fixes = counters["split_fixes"]
+    dropcap_fixes = counters["dropcap_fixes"]
 
-    log(f"[REPAIR] Total fixes: {joins + split_fixes + dropcap_fixes}")
+    log(f"[REPAIR] Broken pairs detected: {broken_pairs}")
+    log(f"[REPAIR] Dictionary joins applied: {joins}")
 
-    # =====================================================================
-    # BOUNDARY PROTECTION (prevent accidental merges)
-    # =====================================================================
+    hits = counters["cache_hits"]
+    misses = counters["cache_misses"]
+    if hits or misses:
+        log(f"[REPAIR] Split cache: {hits:,} hits / {misses:,} misses "
+            f"({hits / (hits + misses):.1%} hit rate)")
 
-    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-    text = re.sub(r'([A-Za-z])(\d)', r'\1 \2', text)
-    text = re.sub(r'(\d)([A-Za-z])', r'\1 \2', text)
+    log(f"[REPAIR] Dictionary splits applied: {split_fixes}")
+    log(f"[REPAIR] Drop-cap fixes applied: {dropcap_fixes}")
 
-    # =====================================================================
-    # SAVE CLEAN
-    # =====================================================================
+    if broken_pairs:
+        log(f"[REPAIR] Join confidence: {joins/broken_pairs:.2%}")
 
-    clean_path = DATASET_DIR / "clean_text.txt"
-    clean_path.write_text(text, encoding="utf-8")
+    log(f"[REPAIR] Total fixes: {joins + split_fixes + dropcap_fixes}")
 
     log(f"[INFO] Saved: {clean_path.name}")
-    log(f"[INFO] Cleaned length: {len(text):,}")
-    log(f"[INFO] Reduction: {original_length - len(text):,}")
-
-    state = json.loads(state_file.read_text())
-    state["stage"] = "cleaned"
-    state_file.write_text(json.dumps(state, indent=2))
+    log(f"[INFO] Cleaned length: {cleaned_length:,}")
+    log(f"[INFO] Reduction: {counters['raw_chars'] - cleaned_length:,}")
 
     log("✅ BLOCK 4 COMPLETE — TEXT CLEANED")
 
+    return {}
+
+def stage_chunk(ctx):
+    """Blocks 5 & 6 — split clean_text.txt into chunks.json"""
+
     # ========================================================================
     # BLOCK 5 & 6: SENTENCE-BASED CHUNKING (COMBINED)
     # ========================================================================
@@ -497,80 +2300,135 @@ def run_pipeline(source_file_path):
     log("="*60)
     log("🧩 BLOCKS 5 & 6 — Starting Chunking Logic")
     
+    DATASET_DIR = ctx.dataset_dir
     clean_path = DATASET_DIR / "clean_text.txt"
     assert clean_path.exists(), "clean_text.txt missing"
     
-    log("📖 Loading cleaned text...")
-    text = clean_path.read_text(encoding="utf-8")
-    
-    # FIX: REMOVE UNICODE QUOTES & DASHES PRIOR TO CHUNKING
-    text = text.replace('\u201c', '"').replace('\u201d', '"') \
-               .replace('\u2018', "'").replace('\u2019', "'") \
-               .replace('\u2014', "-").replace('\u2026', "...")
-    
-    # SENTENCE SPLIT (regex — no spaCy dependency)
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
-    # Remove noisy sentences
-    good = []
-    for s in sentences:
-        s = s.strip()
-        
-        if len(s) < 40:
-            continue
-        
-        # Drop OCR garbage heavy symbol ratio
-        sym_ratio = sum(not c.isalnum() and not c.isspace() for c in s) / max(len(s), 1)
-        if sym_ratio > 0.25:
-            continue
-        
-        good.append(s)
-    
-    log(f"[INFO] Valid sentences kept: {len(good)}")
-    
-    # BUILD WORD-BOUND CHUNKS
-    CHUNK_WORDS = 180
-    OVERLAP_WORDS = 30
-    
-    chunks = []
-    current_words = []
-    
-    for sent in good:
-        w = sent.split()
-        
-        if len(current_words) + len(w) <= CHUNK_WORDS:
-            current_words.extend(w)
-        else:
-            if len(current_words) > 80:
-                chunks.append(" ".join(current_words))
-            
-            # Overlap tail
-            current_words = current_words[-OVERLAP_WORDS:] + w
-    
-    # Last chunk
-    if len(current_words) > 80:
-        chunks.append(" ".join(current_words))
+    # SENTENCE SPLIT (regex — no spaCy dependency), noisy sentence filter
+    # and word-bound chunking run lazily over blocks of the cleaned text;
+    # each chunk is written as it closes and kept as a span for export
+    out_path = DATASET_DIR / "chunks.json"
+    counters = Counter()
+    chunks = ChunkSpans()
+    sizes = array("q")
+    
+    def keep(parts):
+        for chunk, shared, size in parts:
+            chunks.append(chunk, shared)
+            sizes.append(size)
+            yield chunk
+    
+    # Token budgets count words through a per-word cache persisted in the
+    # workspace, so re-chunking at other budgets does not re-tokenize
+    config = ctx.config
+    segmenter = SentenceSegmenter(config.sentence_backend)
+    budget, unit, word_tokens = config.chunk_words, "words", None
+    if config.chunk_tokens:
+        tokenizer = load_tokenizer(config.tokenizer)
+        budget, unit = config.chunk_tokens, f"{tokenizer.name} tokens"
+        if not isinstance(tokenizer, WhitespaceTokenizer):
+            word_tokens = TokenCounter(
+                tokenizer, ctx.cache_dir / f"token_counts_{tokenizer.digest[:16]}.json")
+    log(f"[CHUNK] {budget} {unit} per chunk, {config.overlap_words} words overlap, "
+        f"more than {config.min_chunk_words} {unit} required, {segmenter.backend} sentence splitting")
+    
+    log("📖 Streaming cleaned text...")
+    with open(clean_path, encoding="utf-8") as src:
+        blocks = iter(lambda: src.read(CLEAN_WINDOW_CHARS), "")
+        sentences = iter_good_sentences(segmenter.iter_sentences(blocks), counters,
+                                        config.min_sentence_chars, config.max_symbol_ratio)
+        parts = _iter_chunk_parts(sentences, budget, config.overlap_words,
+                                  config.min_chunk_words, word_tokens)
+        save_json_array(keep(parts), out_path)
+    ctx.chunks = chunks
+    
+    result = {"chunks": len(chunks), "tokens": None}
+    if word_tokens is not None:
+        new_words = len(word_tokens.counts) - word_tokens.loaded
+        word_tokens.save()
+        log(f"[CACHE] Token counts: {len(word_tokens.counts):,} words cached, "
+            f"{new_words:,} newly tokenized")
+    if config.chunk_tokens:
+        result["tokens"] = {
+            "tokenizer": unit.rsplit(" ", 1)[0],
+            "budget": budget,
+            "min": min(sizes, default=0),
+            "max": max(sizes, default=0),
+            "mean": round(statistics.mean(sizes), 2) if sizes else 0,
+            "over_budget": sum(1 for n in sizes if n > budget),
+        }
+        log(f"[INFO] Chunk tokens: {result['tokens']['min']}-{result['tokens']['max']}, "
+            f"{result['tokens']['over_budget']} over budget (single long sentences)")
     
+    seg = segmenter.stats()
+    log(f"[INFO] Sentences: {seg['sentences']:,} ({seg['backend']}, "
+        f"{seg['chars_per_sec'] / 1e6:.1f}M chars/s)")
+    log(f"[INFO] Valid sentences kept: {counters['kept_sentences']}")
     log(f"[INFO] Total chunks created: {len(chunks)}")
-    
-    # Save chunks
-    out_path = DATASET_DIR / "chunks.json"
-    json.dump(chunks, open(out_path, "w", encoding="utf-8"), indent=2, ensure_ascii=False)
+    if not chunks:
+        log(f"[WARN] No chunks produced — no run of kept sentences exceeded "
+            f"{config.min_chunk_words} {unit} (see --min-chunk-words)")
     
     log(f"💾 Saved → {out_path.name}")
     
-    # Update state
-    state = json.loads(state_file.read_text())
-    state["stage"] = "chunked"
-    state["chunks"] = len(chunks)
-    state_file.write_text(json.dumps(state, indent=2))
-    
     log("✅ BLOCKS 5 & 6 COMPLETE — CHUNKING DONE")
     
     if chunks:
         preview = chunks[0][:200] if len(chunks[0]) > 200 else chunks[0]
         log(f"🔍 Preview first chunk: {preview}...")
     
+    result["segmentation"] = seg
+    return result
+
+def stage_dedup(ctx):
+    """Block 7 — find exact and near-duplicate chunks; writes dedup.json"""
+
+    # ========================================================================
+    # BLOCK 7: DEDUPLICATION (EXACT HASH + MINHASH LSH)
+    # ========================================================================
+    
+    log("="*60)
+    log("🧬 BLOCK 7 — Chunk Deduplication")
+    
+    DATASET_DIR = ctx.dataset_dir
+    chunks = ctx.chunks
+    if chunks is None:
+        chunks = json.load(open(DATASET_DIR / "chunks.json", encoding="utf-8"))
+    
+    # Chunks stay in chunks.json; export skips the ids listed here
+    config = ctx.config
+    t0 = time.perf_counter()
+    removed = []
+    if config.dedup_threshold > 0:
+        removed = find_duplicates(chunks, config.dedup_threshold, config.shingle_words,
+                                  config.minhash_perm, config.minhash_bands)
+    else:
+        log("[DEDUP] Disabled (dedup_threshold 0)")
+    elapsed = time.perf_counter() - t0
+    
+    kinds = Counter(kind for _, _, kind, _ in removed)
+    save_json({
+        "threshold": config.dedup_threshold,
+        "chunks": len(chunks),
+        "kept": len(chunks) - len(removed),
+        "exact_removed": kinds["exact"],
+        "near_removed": kinds["near"],
+        "removed": [
+            {"id": i, "duplicate_of": j, "kind": kind, "similarity": sim}
+            for i, j, kind, sim in removed
+        ],
+    }, DATASET_DIR / "dedup.json")
+    
+    log(f"[DEDUP] {kinds['exact']} exact and {kinds['near']} near duplicates removed "
+        f"(threshold {config.dedup_threshold}), {len(chunks) - len(removed)} chunks kept "
+        f"in {elapsed:.2f}s")
+    log("✅ BLOCK 7 COMPLETE — DEDUPLICATION DONE")
+    
+    return {}
+
+def stage_export(ctx):
+    """Block 8 — export training datasets from the chunks kept by Block 7"""
+
     # ========================================================================
     # BLOCK 8: UNIVERSAL DATASET EXPORT (MODEL-AGNOSTIC)
     # ========================================================================
@@ -578,33 +2436,44 @@ def run_pipeline(source_file_path):
     log("="*60)
     log("📦 BLOCK 8 — Universal Dataset Export")
     
+    DATASET_DIR = ctx.dataset_dir
     chunks_path = DATASET_DIR / "chunks.json"
     assert chunks_path.exists(), "chunks.json missing"
     
-    # Load raw chunks
-    raw_chunks = json.load(open(chunks_path, encoding="utf-8"))
+    # Chunks of this run are sliced lazily from the chunk stage's buffer;
+    # a resumed run loads them (text was normalized once in Block 4).
+    # Records are built one at a time while writing, never held in a list.
+    chunks = ctx.chunks
+    if chunks is None:
+        chunks = json.load(open(chunks_path, encoding="utf-8"))
     
-    # FIX: REMOVE UNICODE QUOTES & DASHES
-    chunks = []
-    for c in raw_chunks:
-        cleaned = c.replace('\u201c', '"').replace('\u201d', '"') \
-                   .replace('\u2018', "'").replace('\u2019', "'") \
-                   .replace('\u2014', "-")
-        chunks.append(cleaned)
+    # Duplicates found by Block 7 are left out; records keep their chunk id
+    dedup = json.load(open(DATASET_DIR / "dedup.json", encoding="utf-8"))
+    chunks = ChunkSubset(chunks, (r["id"] for r in dedup["removed"]))
     
-    log(f"📦 Loaded and cleaned {len(chunks)} chunks")
+    log(f"📦 Loaded {len(chunks)} chunks ({len(dedup['removed'])} duplicates skipped)")
+    
+    # Record files are JSON arrays or JSON Lines; files of the other
+    # format from an earlier run are removed
+    fmt = ctx.config.export_format
+    write = EXPORT_WRITERS[fmt]
+    for other in EXPORT_WRITERS:
+        if other != fmt:
+            for name in EXPORT_RECORD_FILES:
+                (DATASET_DIR / f"{name}.{other}").unlink(missing_ok=True)
     
     # MASTER INDEXED DATASET
-    records = []
-    for i, c in enumerate(chunks):
-        records.append({
-            "id": i,
-            "text": c,
-            "word_count": len(c.split())
-        })
+    word_counts = array("q", (len(c.split()) for c in chunks))
+    
+    def record(i):
+        return {
+            "id": chunks.ids[i],
+            "text": chunks[i],
+            "word_count": word_counts[i]
+        }
     
-    save_json(records, DATASET_DIR / "chunks_with_id.json")
-    log("✅ chunks_with_id.json saved")
+    write(map(record, range(len(chunks))), DATASET_DIR / f"chunks_with_id.{fmt}")
+    log(f"✅ chunks_with_id.{fmt} saved")
     
     # BERT / MLM CORPUS
     with open(DATASET_DIR / "corpus.txt", "w", encoding="utf-8") as f:
@@ -614,43 +2483,41 @@ def run_pipeline(source_file_path):
     log("✅ corpus.txt saved")
     
     # LORA / QLORA INSTRUCTION STYLE
-    instruct = []
-    for r in records:
-        instruct.append({
-            "instruction": "Study the following passage and learn its content.",
-            "input": "",
-            "output": r["text"]
-        })
+    instruct = ({
+        "instruction": "Study the following passage and learn its content.",
+        "input": "",
+        "output": c
+    } for c in chunks)
     
-    save_json(instruct, DATASET_DIR / "lora_instruct.json")
-    log("✅ lora_instruct.json saved")
+    write(instruct, DATASET_DIR / f"lora_instruct.{fmt}")
+    log(f"✅ lora_instruct.{fmt} saved")
     
     # PAIR DATASET (NEXT-CHUNK POSITIVE PAIRS)
-    pairs = []
-    for i in range(len(chunks) - 1):
-        pairs.append({
-            "text_a": chunks[i],
-            "text_b": chunks[i + 1],
-            "label": 1
-        })
-    
-    # Add simple negative pairs (only if we have at least 2 chunks)
-    random.seed(42)
-    if len(chunks) >= 2:
-        for _ in range(len(chunks)):
-            a, b = random.sample(chunks, 2)
-            pairs.append({
-                "text_a": a,
-                "text_b": b,
-                "label": 0
-            })
-    
-    save_json(pairs, DATASET_DIR / "pairs.json")
-    log("✅ pairs.json saved")
-    
-    # TRAIN/VAL/TEST SPLIT
+    def pairs():
+        for i in range(len(chunks) - 1):
+            yield {
+                "text_a": chunks[i],
+                "text_b": chunks[i + 1],
+                "label": 1
+            }
+        
+        # Add simple negative pairs (only if we have at least 2 chunks)
+        random.seed(42)
+        if len(chunks) >= 2:
+            for _ in range(len(chunks)):
+                a, b = random.sample(chunks, 2)
+                yield {
+                    "text_a": a,
+                    "text_b": b,
+                    "label": 0
+                }
+    
+    pair_count = write(pairs(), DATASET_DIR / f"pairs.{fmt}")
+    log(f"✅ pairs.{fmt} saved")
+    
+    # TRAIN/VAL/TEST SPLIT (shuffles record ids, same order as the records)
     random.seed(42)
-    shuffled = records.copy()
+    shuffled = list(range(len(chunks)))
     random.shuffle(shuffled)
     
     n = len(shuffled)
@@ -661,21 +2528,32 @@ def run_pipeline(source_file_path):
     val_data = shuffled[train_end:val_end]
     test_data = shuffled[val_end:]
     
-    save_json(train_data, DATASET_DIR / "train.json")
-    save_json(val_data, DATASET_DIR / "val.json")
-    save_json(test_data, DATASET_DIR / "test.json")
+    write(map(record, train_data), DATASET_DIR / f"train.{fmt}")
+    write(map(record, val_data), DATASET_DIR / f"val.{fmt}")
+    write(map(record, test_data), DATASET_DIR / f"test.{fmt}")
     
-    log(f"✅ train.json saved ({len(train_data)} records)")
-    log(f"✅ val.json saved ({len(val_data)} records)")
-    log(f"✅ test.json saved ({len(test_data)} records)")
-    
-    # State update
-    state = json.loads(state_file.read_text())
-    state["stage"] = "datasets_exported"
-    state_file.write_text(json.dumps(state, indent=2))
+    log(f"✅ train.{fmt} saved ({len(train_data)} records)")
+    log(f"✅ val.{fmt} saved ({len(val_data)} records)")
+    log(f"✅ test.{fmt} saved ({len(test_data)} records)")
     
     log("✅ BLOCK 8 COMPLETE — DATASETS READY")
     
+    # Counts for the report, so it need not re-parse the exported files
+    positives = max(len(chunks) - 1, 0)
+    return {"export_counts": {
+        "format": fmt,
+        "records": len(chunks),
+        "pair_labels": [[1, positives], [0, pair_count - positives]],
+        "splits": {
+            "train": len(train_data),
+            "val": len(val_data),
+            "test": len(test_data)
+        }
+    }}
+
+def stage_report(ctx):
+    """Block 9 — dataset evaluation report"""
+
     # ========================================================================
     # BLOCK 9: DATASET EVALUATION REPORT
     # ========================================================================
@@ -683,9 +2561,19 @@ def run_pipeline(source_file_path):
     log("="*60)
     log("[REPORT] BLOCK 9 — Building dataset evaluation report")
     
-    chunks = json.load(open(DATASET_DIR / "chunks.json", encoding="utf-8"))
-    records = json.load(open(DATASET_DIR / "chunks_with_id.json", encoding="utf-8"))
-    pairs = json.load(open(DATASET_DIR / "pairs.json", encoding="utf-8"))
+    DATASET_DIR = ctx.dataset_dir
+    OUTPUT_DIR = ctx.output_dir
+    chunks = ctx.chunks
+    if chunks is None:
+        chunks = json.load(open(DATASET_DIR / "chunks.json", encoding="utf-8"))
+    
+    # Stats describe the exported (deduplicated) chunks
+    dedup = json.load(open(DATASET_DIR / "dedup.json", encoding="utf-8"))
+    chunks = ChunkSubset(chunks, (r["id"] for r in dedup["removed"]))
+    
+    # Record, pair and split counts come from the export stage's state
+    state = StageTracker(ctx.state_file).load()
+    export_counts = state["export_counts"]
     
     # BASIC STATS
     word_counts = [len(c.split()) for c in chunks]
@@ -694,7 +2582,7 @@ def run_pipeline(source_file_path):
     report = {}
     
     report["total_chunks"] = len(chunks)
-    report["total_records"] = len(records)
+    report["total_records"] = export_counts["records"]
     
     # Handle empty datasets
     if word_counts:
@@ -714,8 +2602,9 @@ def run_pipeline(source_file_path):
         report["char_stats"] = {"min": 0, "max": 0, "mean": 0}
     
     # QUALITY CHECKS
-    short_chunks = sum(1 for w in word_counts if w < 80)
-    report["short_chunks_under_80w"] = short_chunks
+    min_words = ctx.config.min_chunk_words
+    report["min_chunk_words"] = min_words
+    report["short_chunks"] = sum(1 for w in word_counts if w <= min_words)
     
     # Duplicates
     dup_count = len(chunks) - len(set(chunks))
@@ -729,20 +2618,38 @@ def run_pipeline(source_file_path):
     
     report["vocab_size_estimate"] = len(vocab)
     
-    # PAIR BALANCE
-    labels = Counter(p["label"] for p in pairs)
-    report["pair_label_balance"] = dict(labels)
+    # DEDUPLICATION (Block 7; removed ids, see dedup.json for their originals)
+    report["dedup"] = {
+        "threshold": dedup["threshold"],
+        "chunks_before": dedup["chunks"],
+        "exact_removed": dedup["exact_removed"],
+        "near_removed": dedup["near_removed"],
+        "removed_ids": [r["id"] for r in dedup["removed"]],
+    }
     
-    # SPLIT SIZES
-    def safe_len(p):
-        return len(json.load(open(DATASET_DIR / p))) if (DATASET_DIR / p).exists() else 0
+    # PAIR BALANCE
+    report["pair_label_balance"] = {
+        label: count for label, count in export_counts["pair_labels"] if count
+    }
     
-    report["splits"] = {
-        "train": safe_len("train.json"),
-        "val": safe_len("val.json"),
-        "test": safe_len("test.json")
+    # EXTRACTION METHOD (per-page stats for PDFs)
+    report["extraction"] = {
+        "method": state.get("method", "unknown"),
+        "page_methods": state.get("page_methods", {}),
+        "ocr_metrics": state.get("ocr_metrics", {}),
     }
     
+    # SENTENCE SEGMENTATION (backend and throughput of the chunk stage)
+    report["sentence_segmentation"] = state.get("segmentation", {})
+    
+    # TOKEN BUDGET (token-budget chunking only)
+    if state.get("tokens"):
+        report["token_stats"] = state["tokens"]
+    
+    # SPLIT SIZES (record files are .json arrays or .jsonl lines)
+    report["export_format"] = export_counts["format"]
+    report["splits"] = export_counts["splits"]
+    
     # SAVE REPORT
     OUTPUT_DIR.mkdir(exist_ok=True)
     
@@ -767,11 +2674,6 @@ def run_pipeline(source_file_path):
     log(f"✅ Report saved: {json_path.name}")
     log(f"✅ Report saved: {txt_path.name}")
     
-    # State update
-    state = json.loads(state_file.read_text())
-    state["stage"] = "evaluation_done"
-    state_file.write_text(json.dumps(state, indent=2))
-    
     # Display summary
     log("="*60)
     log("📊 DATASET QUALITY SUMMARY")
@@ -793,8 +2695,9 @@ def run_pipeline(source_file_path):
    Mean Chars     : {report['char_stats']['mean']}
 
 🧹 QUALITY CHECKS
-   Short Chunks   : {report['short_chunks_under_80w']}
+   Short Chunks   : {report['short_chunks']} (≤ {report['min_chunk_words']} words)
    Duplicates     : {report['duplicate_chunks']}
+   Deduplicated   : {report['dedup']['exact_removed']} exact, {report['dedup']['near_removed']} near
    Vocab Size     : {report['vocab_size_estimate']}
 """)
     
@@ -808,33 +2711,358 @@ def run_pipeline(source_file_path):
         log(f"   {k.capitalize():5} : {v}")
     
     log("\n✅ BLOCK 9 COMPLETE — EVALUATION DONE")
+    
+    return {}
+
+# ============================================================================
+# MAIN PIPELINE FUNCTION
+# ============================================================================
+
+def run_pipeline(source_file_path, extract_workers=None, ocr_dpi=None, job_id=None, config=None):
+    """
+    Main pipeline execution function
+    Combines Blocks 1-9 from the original notebook
+
+    extract_workers: processes for PDF text extraction
+                     (default: PIPELINE_EXTRACT_WORKERS or one per core)
+    ocr_dpi:         render resolution for OCR pages
+                     (default: PIPELINE_OCR_DPI or 200)
+    job_id:          workspace name under jobs/ (default: derived from the
+                     file's content hash, so reruns of a document reuse
+                     its workspace while other documents never collide)
+    config:          PipelineConfig, or a dict of its fields
+                     (default: PipelineConfig())
+
+    Returns the job workspace Path on success, False on failure.
+    """
+    
+    source_path = Path(source_file_path)
+    if not isinstance(config, PipelineConfig):
+        config = PipelineConfig.from_dict(config)
+    
+    if not source_path.exists():
+        log(f"[ERROR] File not found at {source_path}")
+        return False
+
+    # ========================================================================
+    # BLOCK 1: DIRECTORY SETUP & PIPELINE GUARD
+    # ========================================================================
+    
+    log("[START] Starting Dataset Pipeline")
     log("="*60)
-    log("🎯 PIPELINE COMPLETE — ALL DATASETS READY!")
+    
+    # Use the parent directory of the script to find the 'data' folder
+    BASE_DIR = Path(__file__).parent.parent if hasattr(Path(__file__), 'parent') else Path.cwd()
+    DATA_DIR = BASE_DIR / "data"
+    JOBS_DIR = BASE_DIR / JOBS_DIR_NAME
+    extract_cache_dir = BASE_DIR / "cache" / EXTRACT_CACHE_NAME
+    
+    target_pdf = source_path
+    source_hash = file_digest(target_pdf)
+    job_id = job_id or source_hash[:16]
+    
+    WORK_DIR = JOBS_DIR / job_id
+    CACHE_DIR = WORK_DIR / "cache"
+    DATASET_DIR = WORK_DIR / "datasets"
+    OUTPUT_DIR = WORK_DIR / "outputs"
+    
+    with WorkspaceLock(WORK_DIR):
+        # Ensure folders exist
+        for d in [DATA_DIR, extract_cache_dir, CACHE_DIR, OUTPUT_DIR, DATASET_DIR]:
+            d.mkdir(parents=True, exist_ok=True)
+        
+        log(f"[INFO] Working Directory: {BASE_DIR}")
+        log(f"[JOB] Job workspace: {JOBS_DIR_NAME}/{job_id}")
+        
+        ok = _run_in_workspace(
+            target_pdf, source_hash, WORK_DIR, extract_cache_dir,
+            extract_workers, ocr_dpi, config,
+        )
+        os.utime(WORK_DIR)
+    
+    prune_workspaces(JOBS_DIR, MAX_WORKSPACES, current=WORK_DIR)
+    
+    return WORK_DIR if ok else False
+
+def _run_in_workspace(target_pdf, source_hash, work_dir, extract_cache_dir,
+                      extract_workers, ocr_dpi, config):
+    """Blocks 1 (guard) to 9 inside one locked job workspace"""
+    
+    CACHE_DIR = work_dir / "cache"
+    DATASET_DIR = work_dir / "datasets"
+    OUTPUT_DIR = work_dir / "outputs"
+    
+    tracker = StageTracker(CACHE_DIR / "pipeline_state.json")
+    state = tracker.load()
+    
+    # Use uploaded file directly (no duplication into data/)
+    log(f"[INFO] Using source file directly: {target_pdf.name}")
+    
+    current_pdf = target_pdf.name
+    
+    log(f"[INFO] Current File: {current_pdf}")
+    log(f"[INFO] Content hash: {source_hash}")
+    
+    # Detect new vs old file by content, not by (timestamped) upload name
+    if state.get("source_hash") == source_hash:
+        log("[OK] Same file as last run — keeping cache & outputs")
+    else:
+        log("[NEW] New file detected — cleaning old cache/datasets/outputs")
+        
+        for folder in [CACHE_DIR, DATASET_DIR, OUTPUT_DIR]:
+            for item in folder.iterdir():
+                if item.is_file():
+                    item.unlink()
+                else:
+                    shutil.rmtree(item)
+        
+        state = {"pdf": current_pdf, "source_hash": source_hash, "stage": "init"}
+        tracker.save(state)
+    
+    log("[OK] Pipeline guard check complete")
+    
+    # ========================================================================
+    # BLOCK 2: ENVIRONMENT & DEPENDENCY CHECK
+    # ========================================================================
+    
     log("="*60)
+    log("[CHECK] Checking dependencies...")
     
+    # find_spec only — heavy modules (paddle, fitz, numpy) are imported
+    # later, by the stage that needs them
+    caps = capabilities()
+    paddle_ok = caps["paddleocr"] and caps["paddle"]
+    
+    if not paddle_ok:
+        log("   [WARN] PaddleOCR not installed (will use digital extraction only)")
+    
+    log("[INFO] Library Status:")
+    for lib, available in caps.items():
+        if available:
+            log(f"   [OK] {OPTIONAL_LIBS[lib]} OK")
+        else:
+            log(f"   [WARN] {OPTIONAL_LIBS[lib]} missing")
+
+    # ========================================================================
+    # BLOCKS 3-9: STAGE DAG (SKIPS UP-TO-DATE STAGES, RESUMES AFTER CRASHES)
+    # ========================================================================
+
+    # The effective backend goes into the chunk fingerprint
+    if config.sentence_backend == "punkt" and load_punkt() is None:
+        log("   [WARN] NLTK punkt model missing (rule-based sentence splitting)")
+        config = replace(config, sentence_backend="rules")
+
+    is_pdf = target_pdf.suffix.lower() == ".pdf"
+
+    ctx = PipelineContext(
+        target_pdf, source_hash, work_dir, extract_cache_dir,
+        config=config,
+        paddle_ok=paddle_ok,
+        extract_workers=extract_workers,
+        extract_params={
+            "type": "pdf" if is_pdf else "text",
+            "page_min_chars": PAGE_DIGITAL_MIN_CHARS if is_pdf else None,
+            "ocr": paddle_ok if is_pdf else None,
+            "ocr_dpi": (ocr_dpi or OCR_DPI) if is_pdf else None,
+        },
+    )
+    chunk_params = config.to_dict("chunk")
+    if config.chunk_tokens:
+        chunk_params["tokenizer_digest"] = load_tokenizer(config.tokenizer).digest
+
+    # Join/split repairs depend on the dictionary's contents
+    dictionary = load_dictionary()
+    clean_params = {"dictionary_digest": dictionary.digest if dictionary else None}
+
+    last_stage = tracker.load().get("stage", "init")
+    if last_stage != "init":
+        log(f"[INFO] Last completed stage: {last_stage}")
+
+    fp_extract = tracker.run(
+        "extract", [source_hash], ctx.extract_params,
+        [DATASET_DIR / "raw_text.txt"],
+        lambda: stage_extract(ctx), "text_extracted",
+    )
+    if fp_extract is None:
+        return False
+
+    fp_clean = tracker.run(
+        "clean", [fp_extract], clean_params,
+        [DATASET_DIR / "clean_text.txt"],
+        lambda: stage_clean(ctx), "cleaned",
+    )
+    fp_chunk = tracker.run(
+        "chunk", [fp_clean], chunk_params,
+        [DATASET_DIR / "chunks.json"],
+        lambda: stage_chunk(ctx), "chunked",
+    )
+    fp_dedup = tracker.run(
+        "dedup", [fp_chunk], config.to_dict("dedup"),
+        [DATASET_DIR / "dedup.json"],
+        lambda: stage_dedup(ctx), "deduplicated",
+    )
+    fp_export = tracker.run(
+        "export", [fp_dedup], config.to_dict("export"),
+        [DATASET_DIR / n for n in export_files(config.export_format)],
+        lambda: stage_export(ctx), "datasets_exported",
+    )
+    tracker.run(
+        "report", [fp_extract, fp_chunk, fp_dedup, fp_export], {},
+        [OUTPUT_DIR / "dataset_report.json", OUTPUT_DIR / "dataset_report.txt"],
+        lambda: stage_report(ctx), "evaluation_done",
+    )
+
+    log("="*60)
+    log("🎯 PIPELINE COMPLETE — ALL DATASETS READY!")
+    log("="*60)
+
     return True
 
 
 # ============================================================================
-# MAIN ENTRY POINT
+# PERSISTENT WORKER MODE (NDJSON OVER STDIN/STDOUT)
 # ============================================================================
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        
+def serve_worker(preload_ocr=False):
+    """
+    Long-running worker: newline-delimited JSON-RPC over stdin/stdout.
+
+    Keeps the interpreter, imports, dictionary and OCR model warm between
+    jobs. Jobs run one at a time, in the order received.
+
+    Requests (one JSON object per line on stdin):
+        {"id": "job-1", "method": "run", "params": {"path": "...", ...}}
+            params may carry "config": {"chunk_words": 256, ...}
+            (PipelineConfig fields)
+        {"id": "p", "method": "ping"}
+        {"method": "shutdown"}
+
+    Events (one JSON object per line on stdout):
+        {"event": "ready", "pid": 1234}
+        {"id": "job-1", "event": "log", "message": "..."}
+        {"id": "job-1", "event": "result", "ok": true}
+        {"id": "job-1", "event": "result", "ok": false, "error": "..."}
+    """
+    global _log_sink
+    import threading
+    import traceback
+
+    # Only protocol lines may reach the real stdout; anything else a
+    # library prints is diverted to stderr
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    out_lock = threading.Lock()
+
+    def emit(obj):
+        with out_lock:
+            out.write(json.dumps(obj) + "\n")
+            out.flush()
+
+    current = {"id": None}
+    _log_sink = lambda message: emit({"id": current["id"], "event": "log", "message": message})
+
+    load_dictionary()
+    if preload_ocr and has_module("paddleocr"):
+        OCREngine.get()
+
+    emit({"event": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
         try:
-            success = run_pipeline(input_file)
-            if success:
-                sys.exit(0)
-            else:
-                sys.exit(1)
+            req = json.loads(line)
+        except ValueError as e:
+            emit({"id": None, "event": "result", "ok": False, "error": f"bad request: {e}"})
+            continue
+
+        job_id = req.get("id")
+        method = req.get("method")
+        params = req.get("params") or {}
+
+        if method == "shutdown":
+            emit({"id": job_id, "event": "result", "ok": True})
+            break
+        if method == "ping":
+            emit({"id": job_id, "event": "result", "ok": True, "pid": os.getpid()})
+            continue
+        if method != "run":
+            emit({"id": job_id, "event": "result", "ok": False, "error": f"unknown method: {method}"})
+            continue
+
+        current["id"] = job_id
+        try:
+            workspace = run_pipeline(
+                params["path"],
+                extract_workers=params.get("extract_workers"),
+                ocr_dpi=params.get("ocr_dpi"),
+                job_id=params.get("job_id"),
+                config=params.get("config"),
+            )
+            result = {"id": job_id, "event": "result", "ok": bool(workspace)}
+            if workspace:
+                result["workspace"] = workspace.name
+            emit(result)
         except Exception as e:
             log(f"[ERROR] PIPELINE ERROR: {e}")
-            import traceback
             traceback.print_exc()
-            sys.exit(1)
-    else:
+            emit({"id": job_id, "event": "result", "ok": False, "error": str(e)})
+        finally:
+            current["id"] = None
+
+# ============================================================================
+# MAIN ENTRY POINT
+# ============================================================================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Dataset pipeline engine (Blocks 1-9)",
+        epilog="Without --worker or --build-dictionary, runs one job on FILE.",
+    )
+    parser.add_argument("file", nargs="?", help="PDF or text file to process")
+    parser.add_argument("--worker", action="store_true", help="serve NDJSON jobs on stdin/stdout")
+    parser.add_argument("--preload-ocr", action="store_true", help="with --worker: load OCR at startup")
+    parser.add_argument("--build-dictionary", action="store_true", help="compile the dictionary and exit")
+
+    chunking = parser.add_argument_group("chunking, deduplication & export (PipelineConfig)")
+    for f in fields(PipelineConfig):
+        chunking.add_argument("--" + f.name.replace("_", "-"), dest=f.name, type=f.type,
+                              default=f.default, metavar=f.type.__name__.upper(),
+                              help=f"(default: {f.default})")
+
+    args = parser.parse_args(argv)
+
+    if args.build_dictionary:
+        out = build_dictionary()
+        print(f"LOG: [DICT] Built {out.name} ({len(FrequencyDictionary.load(out)):,} words)", flush=True)
+        return 0
+
+    if args.worker:
+        serve_worker(preload_ocr=args.preload_ocr)
+        return 0
+
+    if not args.file:
         print("LOG: ❌ No input file provided to Python script", flush=True)
-        print("Usage: python pipeline_engine.py <path_to_pdf_or_txt_file>", flush=True)
-        sys.exit(1)
\ No newline at end of file
+        parser.print_usage(sys.stdout)
+        return 1
+
+    try:
+        config = PipelineConfig.from_dict(
+            {f.name: getattr(args, f.name) for f in fields(PipelineConfig)})
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        return 0 if run_pipeline(args.file, config=config) else 1
+    except Exception as e:
+        log(f"[ERROR] PIPELINE ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
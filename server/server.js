@@ -5,6 +5,7 @@ const express = require('express');
 const multer = require('multer');
 const cors = require('cors');
 const { spawn } = require('child_process');
+const readline = require('readline');
 const path = require('path');
 const fs = require('fs').promises;
 
@@ -21,21 +22,137 @@ app.use(express.static(path.join(__dirname, 'public')));
 // PYTHON DETECTION
 // ============================================================================
 
+let pythonCommand = null;
+
 /**
- * Detect Python executable path
+ * Detect Python executable path (probed once, then cached)
  */
 function getPythonCommand() {
+  if (pythonCommand) return pythonCommand;
+
   // Try different Python commands
   const commands = ['python', 'python3', 'py'];
   for (const cmd of commands) {
     try {
       require('child_process').execSync(`${cmd} --version`, { stdio: 'ignore' });
+      pythonCommand = cmd;
       return cmd;
     } catch (e) {
       // Command not available, try next
     }
   }
-  return 'python'; // Default fallback
+  pythonCommand = 'python'; // Default fallback
+  return pythonCommand;
+}
+
+// ============================================================================
+// PERSISTENT PYTHON WORKER
+// ============================================================================
+
+/**
+ * Long-running `pipeline_engine.py --worker` process.
+ * Keeps the interpreter, dictionary and OCR model warm between jobs.
+ * Jobs are sent as newline-delimited JSON; log/result events come back
+ * tagged with the job id. The worker is (re)started on demand.
+ */
+class PipelineWorker {
+  constructor(script) {
+    this.script = script;
+    this.proc = null;
+    this.jobs = new Map();
+  }
+
+  start() {
+    if (this.proc) return;
+
+    const proc = spawn(getPythonCommand(), [this.script, '--worker']);
+    this.proc = proc;
+    console.log(`[Worker] Starting: ${getPythonCommand()} ${this.script} --worker`);
+
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => this.onLine(line));
+
+    proc.stderr.on('data', (data) => {
+      console.error('Python Error:', data.toString());
+    });
+
+    const fail = (reason) => {
+      if (this.proc === proc) this.proc = null;
+      for (const job of this.jobs.values()) {
+        job.onResult({ ok: false, error: reason });
+      }
+      this.jobs.clear();
+    };
+
+    proc.on('close', (code) => fail(`worker exited with code ${code}`));
+    proc.on('error', (error) => fail(`worker error: ${error.message}`));
+  }
+
+  onLine(line) {
+    let msg;
+    try {
+      msg = JSON.parse(line);
+    } catch {
+      console.log('[Worker]', line);
+      return;
+    }
+
+    if (msg.event === 'ready') {
+      console.log(`[Worker] Ready (pid ${msg.pid})`);
+      return;
+    }
+
+    const job = this.jobs.get(msg.id);
+    if (!job) return;
+
+    if (msg.event === 'log') {
+      job.onLog(msg.message);
+    } else if (msg.event === 'result') {
+      this.jobs.delete(msg.id);
+      job.onResult(msg);
+    }
+  }
+
+  /**
+   * Queue a pipeline job; returns its id
+   */
+  run(params, onLog, onResult) {
+    this.start();
+
+    const id = `job-${PipelineWorker.nextId++}`;
+    this.jobs.set(id, { onLog, onResult });
+    this.proc.stdin.write(JSON.stringify({ id, method: 'run', params }) + '\n');
+    return id;
+  }
+}
+
+// Each job runs in its own jobs/<id>/ workspace, so several workers can
+// process different uploads in parallel
+const WORKER_COUNT = Math.max(1, parseInt(process.env.PIPELINE_WORKERS || '2', 10));
+PipelineWorker.nextId = 1;
+
+const pipelineWorkers = Array.from({ length: WORKER_COUNT }, () =>
+  new PipelineWorker(path.join(__dirname, 'python_src', 'pipeline_engine.py'))
+);
+
+/**
+ * Pick the worker with the fewest queued jobs
+ */
+function nextWorker() {
+  return pipelineWorkers.reduce((best, w) => (w.jobs.size < best.jobs.size ? w : best));
+}
+
+// Workspace of the most recent successful job (default for the GET endpoints)
+let latestJob = null;
+
+/**
+ * Resolve the workspace directory for ?job=<id> (or the latest job)
+ */
+function jobDir(req) {
+  const job = req.query.job || latestJob;
+  if (!job || !/^[\w.-]+$/.test(job)) {
+    throw new Error('No pipeline job available');
+  }
+  return path.join(__dirname, 'jobs', job);
 }
 
 // Configure file upload
@@ -59,7 +176,8 @@ app.post('/api/clean-all', async (req, res) => {
       'data',
       'datasets',
       'outputs',
-      'cache'
+      'cache',
+      'jobs'
     ];
 
     for (const dir of CLEAN_DIRS) {
@@ -139,46 +257,25 @@ app.post('/api/run-pipeline', async (req, res) => {
   res.setHeader('Connection', 'keep-alive');
   
   try {
-    // Path to Python script
-    const pythonScript = path.join(__dirname, 'python_src', 'pipeline_engine.py');
-    const pythonCmd = getPythonCommand();
-    
-    console.log(`[Server] Spawning Python: ${pythonCmd} ${pythonScript} ${filePath}`);
-    res.write(`LOG: [START] Using Python command: ${pythonCmd}\n`);
-    
-    // Spawn Python process
-    const pythonProcess = spawn(pythonCmd, [pythonScript, filePath]);
-    
-    // Stream stdout (logs) to client
-    pythonProcess.stdout.on('data', (data) => {
-      const output = data.toString();
-      res.write(output);
-    });
-    
-    // Stream stderr (errors) to client
-    pythonProcess.stderr.on('data', (data) => {
-      const error = data.toString();
-      console.error('Python Error:', error);
-      res.write(`LOG: [PYTHON_ERROR] ${error}\n`);
-    });
-    
-    // Handle process completion
-    pythonProcess.on('close', (code) => {
-      if (code === 0) {
-        res.write('LOG: [OK] Pipeline completed successfully\n');
-      } else {
-        res.write(`LOG: [ERROR] Pipeline exited with code ${code}\n`);
+    res.write(`LOG: [START] Using Python worker: ${getPythonCommand()}\n`);
+
+    const jobId = nextWorker().run(
+      { path: filePath },
+      (message) => res.write(`LOG: ${message}\n`),
+      (result) => {
+        if (result.ok) {
+          latestJob = result.workspace;
+          res.write(`LOG: [JOB] ${result.workspace}\n`);
+          res.write('LOG: [OK] Pipeline completed successfully\n');
+        } else {
+          res.write(`LOG: [ERROR] Pipeline failed${result.error ? `: ${result.error}` : ''}\n`);
+        }
+        res.end();
       }
-      res.end();
-    });
-    
-    // Handle errors
-    pythonProcess.on('error', (error) => {
-      console.error('Process error:', error);
-      res.write(`LOG: [ERROR] Process error: ${error.message}\n`);
-      res.end();
-    });
-    
+    );
+
+    console.log(`[Server] Queued ${jobId} for ${filePath}`);
+
   } catch (error) {
     console.error('Pipeline error:', error);
     res.write(`LOG: ❌ ${error.message}\n`);
@@ -188,11 +285,11 @@ app.post('/api/run-pipeline', async (req, res) => {
 
 /**
  * Get generated datasets
- * Returns all dataset files from the datasets directory
+ * Returns all dataset files of a job (?job=<id>, default: latest job)
  */
 app.get('/api/datasets', async (req, res) => {
   try {
-    const datasetsDir = path.join(__dirname, 'datasets');
+    const datasetsDir = path.join(jobDir(req), 'datasets');
     const files = {};
     
     // Read all files in datasets directory
@@ -204,6 +301,9 @@ app.get('/api/datasets', async (req, res) => {
       
       if (fileName.endsWith('.json')) {
         files[fileName] = JSON.parse(content);
+      } else if (fileName.endsWith('.jsonl')) {
+        // JSON Lines export: one record per line
+        files[fileName] = content.split('\n').filter(Boolean).map((line) => JSON.parse(line));
       } else {
         files[fileName] = content;
       }
@@ -218,11 +318,11 @@ app.get('/api/datasets', async (req, res) => {
 
 /**
  * Get evaluation report
- * Returns the dataset quality report
+ * Returns the dataset quality report of a job (?job=<id>, default: latest job)
  */
 app.get('/api/report', async (req, res) => {
   try {
-    const reportPath = path.join(__dirname, 'outputs', 'dataset_report.json');
+    const reportPath = path.join(jobDir(req), 'outputs', 'dataset_report.json');
     const content = await fs.readFile(reportPath, 'utf-8');
     res.json(JSON.parse(content));
   } catch (error) {
@@ -238,7 +338,7 @@ app.get('/api/report', async (req, res) => {
 app.get('/api/download/:filename', async (req, res) => {
   try {
     const { filename } = req.params;
-    const filePath = path.join(__dirname, 'datasets', filename);
+    const filePath = path.join(jobDir(req), 'datasets', path.basename(filename));
     
     // Check if file exists
     await fs.access(filePath);
@@ -272,7 +372,8 @@ app.delete('/api/clean-all', async (req, res) => {
       'data',
       'datasets',
       'outputs',
-      'cache'
+      'cache',
+      'jobs'
     ];
 
     for (const dir of CLEAN_DIRS) {
@@ -331,6 +432,9 @@ app.listen(PORT, () => {
 // Handle graceful shutdown
 process.on('SIGTERM', () => {
   console.log('Shutting down server...');
+  for (const w of pipelineWorkers) {
+    if (w.proc) w.proc.kill();
+  }
   process.exit(0);
 });
 